@@ -2,10 +2,34 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from groq import Groq
+import metrics
+import transport
+import evaluation_store
+import token_budget
+import model_routing
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend access
+metrics.init_app(app, service="llm")
+transport.init_app(app)
+
+# Per-student partial summaries for incremental /student_evaluate
+summary_store = evaluation_store.EvaluationStore(os.environ.get("SUMMARY_STORE_PATH"))
+# Concurrent LLM calls per request when a request is split into chunks
+# (/student_evaluate summaries, /adjust_ocr text)
+LLM_MAX_PARALLEL_CALLS = int(os.environ.get("LLM_MAX_PARALLEL_CALLS", 4))
+metrics.registry.describe("summary_store_students", "gauge", "Students with stored partial evaluation summaries.")
+metrics.registry.describe("summary_cache_reused_total", "counter", "Partial summaries served from the per-student cache.")
+metrics.registry.describe("summary_cache_computed_total", "counter", "Partial summaries (map or reduce) generated by the LLM.")
+
+# max_tokens sizing per endpoint, as (ratio, base, minimum, maximum):
+# max_tokens = base + ratio * input tokens, clamped to [minimum, maximum]
+GRADE_OUTPUT_SIZING = (2.0, 384, 1024, 2048)     # feedback + corrected (ideal) answer
+CORRECT_OUTPUT_SIZING = (1.5, 48, 64, 1024)      # corrected answer only
+OCR_OUTPUT_SIZING = (1.3, 64, 128, token_budget.MAX_COMPLETION_TOKENS)
+EVALUATION_MAX_TOKENS = 768                      # three short paragraphs
 
 # Lazy initialization of Groq client
 def get_groq_client():
@@ -15,37 +39,36 @@ def get_groq_client():
         raise ValueError("GROQ_API_KEY environment variable is not set")
     return Groq(api_key=api_key)
 
+def create_chat_completion(client, **kwargs):
+    """
+    Call the Groq chat completions API, recording latency and token usage.
+    Raises token_budget.RequestTooLarge before calling the API if the
+    estimated prompt plus max_tokens exceeds the request limit.
+    """
+    estimated_prompt_tokens = token_budget.count_message_tokens(kwargs["messages"])
+    token_budget.check_request(estimated_prompt_tokens, kwargs.get("max_tokens", 0))
+
+    with metrics.stage("llm_call"):
+        chat_completion = client.chat.completions.create(**kwargs)
+    metrics.record_llm_usage(
+        kwargs.get("model"),
+        getattr(chat_completion, "usage", None),
+        estimated_prompt_tokens=estimated_prompt_tokens,
+        max_tokens=kwargs.get("max_tokens"),
+        finish_reason=chat_completion.choices[0].finish_reason if chat_completion.choices else None
+    )
+    return chat_completion
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy"}), 200
 
-@app.route('/grade', methods=['POST'])
-def grade_answer():
-    """
-    Grade a student's answer against a question
-    Expected JSON body:
-    {
-        "question": "What is the capital of France?",
-        "student_answer": "Paris",
-        "rubric": "Optional grading criteria" (optional)
-    }
-    """
-    try:
-        data = request.json
-        question = data.get('question', '')
-        student_answer = data.get('student_answer', '')
-        rubric = data.get('rubric', '')
-
-        if not question or not student_answer:
-            return jsonify({"error": "Both question and student_answer are required"}), 400
-
-        # Get Groq client
-        client = get_groq_client()
-
-        # Construct the grading prompt
-        if rubric:
-            prompt = f"""You are an expert grading assistant. Grade the following student answer.
+def grade_student_answer(client, question, student_answer, rubric=''):
+    """Grade one answer with the LLM and return the parsed grading fields"""
+    # Construct the grading prompt
+    if rubric:
+        prompt = f"""You are an expert grading assistant. Grade the following student answer.
 
 Question: {question}
 
@@ -69,8 +92,8 @@ Format your response as JSON with the following structure:
     "suggestions": "<specific suggestions>",
     "corrected_answer": "<ideal answer>"
 }}"""
-        else:
-            prompt = f"""You are an expert grading assistant. Grade the following student answer.
+    else:
+        prompt = f"""You are an expert grading assistant. Grade the following student answer.
 
 Question: {question}
 
@@ -91,57 +114,68 @@ Format your response as JSON with the following structure:
     "corrected_answer": "<ideal answer>"
 }}"""
 
+    # The ideal answer and feedback scale with the question and rubric, not
+    # just the student's answer (which may be a few words)
+    input_tokens = sum(token_budget.count_tokens(text) for text in (question, rubric, student_answer))
+    max_tokens = token_budget.output_budget(input_tokens, *GRADE_OUTPUT_SIZING)
+
+    def attempt(model, sample, small):
+        system_prompt = "You are an expert grading assistant. Always respond with valid JSON."
+        if small:
+            # Self-reported confidence is one of the cascade's escalation signals
+            system_prompt += model_routing.CONFIDENCE_INSTRUCTION
+
         # Call Groq API
-        chat_completion = client.chat.completions.create(
+        chat_completion = create_chat_completion(
+            client,
             messages=[
                 {
                     "role": "system",
-                    "content": "You are an expert grading assistant. Always respond with valid JSON."
+                    "content": system_prompt
                 },
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            model="llama-3.3-70b-versatile",  # Free model on Groq
-            temperature=0.3,  # Lower temperature for more consistent grading
-            max_tokens=1024,
+            model=model,
+            temperature=0.3 if sample == 0 else 0.7,  # Lower temperature for more consistent grading
+            max_tokens=max_tokens,
             response_format={"type": "json_object"}  # Ensure JSON response
         )
 
         # Extract and parse the JSON response
         result_string = chat_completion.choices[0].message.content
         result = json.loads(result_string)
+        if not isinstance(result, dict):
+            raise ValueError("Grading response is not a JSON object")
+        return result
+
+    result, _ = model_routing.route("grade", attempt, model_routing.check_grade, model_routing.grades_agree)
+    return {
+        "score": result.get("score"),
+        "feedback_correct": result.get("feedback_correct"),
+        "feedback_incorrect": result.get("feedback_incorrect"),
+        "suggestions": result.get("suggestions"),
+        "corrected_answer": result.get("corrected_answer")
+    }
 
-        return jsonify({
-            "success": True,
-            "score": result.get("score"),
-            "feedback_correct": result.get("feedback_correct"),
-            "feedback_incorrect": result.get("feedback_incorrect"),
-            "suggestions": result.get("suggestions"),
-            "corrected_answer": result.get("corrected_answer")
-        }), 200
-
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
-
-@app.route('/correct', methods=['POST'])
-def correct_answer():
+@app.route('/grade', methods=['POST'])
+def grade_answer():
     """
-    Correct a student's answer without detailed grading
+    Grade a student's answer against a question
     Expected JSON body:
     {
         "question": "What is the capital of France?",
-        "student_answer": "Paris is capital"
+        "student_answer": "Paris",
+        "rubric": "Optional grading criteria" (optional)
     }
     """
     try:
         data = request.json
         question = data.get('question', '')
         student_answer = data.get('student_answer', '')
+        rubric = data.get('rubric', '')
 
         if not question or not student_answer:
             return jsonify({"error": "Both question and student_answer are required"}), 400
@@ -149,7 +183,29 @@ def correct_answer():
         # Get Groq client
         client = get_groq_client()
 
-        prompt = f"""Given the following question and student answer, provide a corrected version of the answer.
+        result = grade_student_answer(client, question, student_answer, rubric)
+
+        return jsonify({
+            "success": True,
+            **result
+        }), 200
+
+    except token_budget.RequestTooLarge as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 413
+
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def correct_student_answer(client, question, student_answer):
+    """Return a corrected version of a student's answer"""
+    prompt = f"""Given the following question and student answer, provide a corrected version of the answer.
 
 Question: {question}
 
@@ -157,57 +213,75 @@ Student's Answer: {student_answer}
 
 Provide a clear, concise, and grammatically correct version of the answer. Only return the corrected answer text without any additional explanation."""
 
+    def attempt(model, sample, small):
         # Call Groq API
-        chat_completion = client.chat.completions.create(
+        chat_completion = create_chat_completion(
+            client,
             messages=[
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.3,
-            max_tokens=512
+            model=model,
+            temperature=0.3 if sample == 0 else 0.7,
+            max_tokens=token_budget.output_budget(token_budget.count_tokens(student_answer), *CORRECT_OUTPUT_SIZING)
         )
+        return chat_completion.choices[0].message.content.strip()
 
-        corrected = chat_completion.choices[0].message.content.strip()
-
-        return jsonify({
-            "success": True,
-            "corrected_answer": corrected
-        }), 200
-
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+    corrected, _ = model_routing.route(
+        "correct",
+        attempt,
+        lambda output, policy: model_routing.check_text(output, student_answer, policy),
+        model_routing.texts_agree
+    )
+    return corrected
 
-# help OCR to fix some words that doesnt make sense
-@app.route('/adjust_ocr', methods=['POST'])
-def adjust_ocr():
+@app.route('/correct', methods=['POST'])
+def correct_answer():
     """
-    Correct OCR output text by fixing incorrect words and improving readability
+    Correct a student's answer without detailed grading
     Expected JSON body:
     {
-        "ocr_text": "The qick brown fox jmps over the lazy dog",
-        "context": "Optional context about the document type" (optional)
+        "question": "What is the capital of France?",
+        "student_answer": "Paris is capital"
     }
     """
     try:
         data = request.json
-        ocr_text = data.get('ocr_text', '')
-        context = data.get('context', '')
+        question = data.get('question', '')
+        student_answer = data.get('student_answer', '')
 
-        if not ocr_text:
-            return jsonify({"error": "ocr_text is required"}), 400
+        if not question or not student_answer:
+            return jsonify({"error": "Both question and student_answer are required"}), 400
 
         # Get Groq client
         client = get_groq_client()
 
-        # Construct the OCR correction prompt
-        if context:
-            prompt = f"""You are an OCR text correction expert. The following text was extracted using OCR and contains errors. Please correct spelling mistakes, fix garbled words, and improve readability while preserving the original meaning.
+        corrected = correct_student_answer(client, question, student_answer)
+
+        return jsonify({
+            "success": True,
+            "corrected_answer": corrected
+        }), 200
+
+    except token_budget.RequestTooLarge as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 413
+
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def _adjust_ocr_messages(ocr_text, context=''):
+    # Construct the OCR correction prompt
+    if context:
+        prompt = f"""You are an OCR text correction expert. The following text was extracted using OCR and contains errors. Please correct spelling mistakes, fix garbled words, and improve readability while preserving the original meaning.
 
 Context: {context}
 
@@ -223,8 +297,8 @@ Please provide the corrected text that:
 6. Without adding new words not present in the original text
 
 Only return the corrected text without any additional explanation or commentary."""
-        else:
-            prompt = f"""You are an OCR text correction expert. The following text was extracted using OCR and contains errors. Please correct spelling mistakes, fix garbled words, and improve readability while preserving the original meaning.
+    else:
+        prompt = f"""You are an OCR text correction expert. The following text was extracted using OCR and contains errors. Please correct spelling mistakes, fix garbled words, and improve readability while preserving the original meaning.
 
 OCR Text to correct:
 {ocr_text}
@@ -239,67 +313,111 @@ Please provide the corrected text that:
 
 Only return the corrected text without any additional explanation or commentary."""
 
+    return [
+        {
+            "role": "system",
+            "content": "You are an expert OCR text correction assistant. Correct OCR errors while preserving the original meaning and structure."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+def correct_ocr_text(client, ocr_text, context=''):
+    """
+    Correct OCR text with the LLM. Text whose prompt plus expected output
+    would overflow a single request is split on line boundaries and the
+    chunks are corrected separately.
+    """
+    overhead = token_budget.count_message_tokens(_adjust_ocr_messages("", context))
+    chunk_tokens = token_budget.max_input_tokens(overhead, *OCR_OUTPUT_SIZING[:2])
+    if token_budget.count_tokens(ocr_text) <= chunk_tokens:
+        return _correct_ocr_chunk(client, ocr_text, context)
+
+    chunks = token_budget.split_text(ocr_text, chunk_tokens)
+    corrected = _run_parallel(lambda chunk: _correct_ocr_chunk(client, chunk, context), chunks)
+    return "\n".join(corrected)
+
+def _correct_ocr_chunk(client, ocr_text, context):
+    # Output is roughly the size of the input text
+    max_tokens = token_budget.output_budget(token_budget.count_tokens(ocr_text), *OCR_OUTPUT_SIZING)
+
+    def attempt(model, sample, small):
         # Call Groq API
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert OCR text correction assistant. Correct OCR errors while preserving the original meaning and structure."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.1,  # Very low temperature for consistent corrections
-            max_tokens=2048
+        chat_completion = create_chat_completion(
+            client,
+            messages=_adjust_ocr_messages(ocr_text, context),
+            model=model,
+            temperature=0.1 if sample == 0 else 0.5,  # Very low temperature for consistent corrections
+            max_tokens=max_tokens
         )
 
         # Extract the corrected text
-        corrected_text = chat_completion.choices[0].message.content.strip()
+        return chat_completion.choices[0].message.content.strip()
 
-        return jsonify({
-            "success": True,
-            "original_text": ocr_text,
-            "corrected_text": corrected_text
-        }), 200
+    corrected_text, _ = model_routing.route(
+        "adjust_ocr",
+        attempt,
+        lambda output, policy: model_routing.check_text(output, ocr_text, policy),
+        model_routing.texts_agree
+    )
+    return corrected_text
 
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
-
-@app.route('/student_evaluate', methods=['POST'])
-def student_evaluate():
+# help OCR to fix some words that doesnt make sense
+@app.route('/adjust_ocr', methods=['POST'])
+def adjust_ocr():
     """
-    Generate consolidated evaluation summary from individual question feedback
+    Correct OCR output text by fixing incorrect words and improving readability
     Expected JSON body:
     {
-        "strengths": ["• You correctly identified...", "• Great understanding of..."],
-        "improvements": ["• Need to be more specific about...", "• Consider explaining..."],
-        "suggestions": ["• Review the fundamentals of...", "• Practice more examples..."]
+        "ocr_text": "The qick brown fox jmps over the lazy dog",
+        "context": "Optional context about the document type" (optional)
     }
     """
     try:
         data = request.json
-        strengths = data.get('strengths', [])
-        improvements = data.get('improvements', [])
-        suggestions = data.get('suggestions', [])
+        ocr_text = data.get('ocr_text', '')
+        context = data.get('context', '')
 
-        if not strengths and not improvements and not suggestions:
-            return jsonify({"error": "At least one of strengths, improvements, or suggestions is required"}), 400
+        if not ocr_text:
+            return jsonify({"error": "ocr_text is required"}), 400
 
         # Get Groq client
         client = get_groq_client()
 
-        # Prepare the feedback text
-        strengths_text = "\n".join(strengths) if strengths else "No specific strengths identified."
-        improvements_text = "\n".join(improvements) if improvements else "No specific areas for improvement identified."
-        suggestions_text = "\n".join(suggestions) if suggestions else "No specific study suggestions available."
+        corrected_text = correct_ocr_text(client, ocr_text, context)
+
+        return jsonify({
+            "success": True,
+            "original_text": ocr_text,
+            "corrected_text": corrected_text
+        }), 200
+
+    except token_budget.RequestTooLarge as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 413
 
-        prompt = f"""You are an educational assessment expert. Based on the following detailed feedback from individual questions, create a concise overall evaluation summary for a student.
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def _summary_prompt(feedback):
+    strengths = feedback.get('strengths', [])
+    improvements = feedback.get('improvements', [])
+    suggestions = feedback.get('suggestions', [])
+
+    # Prepare the feedback text
+    strengths_text = "\n".join(strengths) if strengths else "No specific strengths identified."
+    improvements_text = "\n".join(improvements) if improvements else "No specific areas for improvement identified."
+    suggestions_text = "\n".join(suggestions) if suggestions else "No specific study suggestions available."
+
+    prompt = f"""You are an educational assessment expert. Based on the following detailed feedback from individual questions, create a concise overall evaluation summary for a student.
 
 Individual Question Strengths:
 {strengths_text}
@@ -323,74 +441,32 @@ Format your response as JSON with the following structure:
     "overall_improvements": "<consolidated areas for improvement>",
     "overall_suggestions": "<consolidated study suggestions>"
 }}"""
+    return prompt
 
-        # Call Groq API
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an educational assessment expert. Always respond with valid JSON that consolidates detailed feedback into concise summaries."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.3,
-            max_tokens=1024,
-            response_format={"type": "json_object"}
-        )
+def summarize_feedback(client, feedback):
+    """Summarize one set of strengths/improvements/suggestions bullets (map step)"""
+    return _evaluation_completion(client, _summary_prompt(feedback))
 
-        # Extract and parse the JSON response
-        result_string = chat_completion.choices[0].message.content
-        result = json.loads(result_string)
+def merge_summaries(client, summaries):
+    """Merge partial evaluation summaries, each covering a group of questions (reduce step)"""
+    parts = []
+    for i, summary in enumerate(summaries, 1):
+        parts.append(f"""Summary {i}:
+Strengths: {summary.get("overall_strengths", "")}
+Areas for Improvement: {summary.get("overall_improvements", "")}
+Study Suggestions: {summary.get("overall_suggestions", "")}""")
+    summaries_text = "\n\n".join(parts)
 
-        return jsonify({
-            "success": True,
-            "overall_strengths": result.get("overall_strengths", ""),
-            "overall_improvements": result.get("overall_improvements", ""),
-            "overall_suggestions": result.get("overall_suggestions", "")
-        }), 200
+    prompt = f"""You are an educational assessment expert. The following partial evaluation summaries each cover a different group of questions from the same student. Merge them into one concise overall evaluation summary.
 
-    except Exception as e:
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
-        data = request.json
-        strengths = data.get('strengths', [])
-        improvements = data.get('improvements', [])
-        suggestions = data.get('suggestions', [])
-
-        if not strengths and not improvements and not suggestions:
-            return jsonify({"error": "At least one of strengths, improvements, or suggestions is required"}), 400
-
-        # Get Groq client
-        client = get_groq_client()
-
-        # Prepare the feedback text
-        strengths_text = "\n".join(strengths) if strengths else "No specific strengths identified."
-        improvements_text = "\n".join(improvements) if improvements else "No specific areas for improvement identified."
-        suggestions_text = "\n".join(suggestions) if suggestions else "No specific study suggestions available."
-
-        prompt = f"""You are an educational assessment expert. Based on the following detailed feedback from individual questions, create a concise overall evaluation summary for a student.
-
-Individual Question Strengths:
-{strengths_text}
-
-Individual Question Areas for Improvement:
-{improvements_text}
-
-Individual Question Study Suggestions:
-{suggestions_text}
+{summaries_text}
 
 Please provide a consolidated summary with:
 1. Overall Strengths: A brief paragraph highlighting the student's main strengths across all questions
 2. Areas for Improvement: A brief paragraph identifying the key areas where the student needs to improve
 3. Study Suggestions: A brief paragraph with actionable study recommendations
 
-Keep each section concise (2-3 sentences maximum) and focus on the most important themes across all questions.
+Keep each section concise (2-3 sentences maximum) and focus on the most important themes across all summaries.
 
 Format your response as JSON with the following structure:
 {{
@@ -399,41 +475,184 @@ Format your response as JSON with the following structure:
     "overall_suggestions": "<consolidated study suggestions>"
 }}"""
 
+    return _evaluation_completion(client, prompt)
+
+def _run_parallel(fn, items):
+    """Apply fn to each item on a thread pool, keeping request context for metrics"""
+    if len(items) <= 1 or LLM_MAX_PARALLEL_CALLS <= 1:
+        return [fn(item) for item in items]
+    tasks = [metrics.propagate(fn) for _ in items]
+    with ThreadPoolExecutor(max_workers=LLM_MAX_PARALLEL_CALLS) as pool:
+        futures = [pool.submit(task, item) for task, item in zip(tasks, items)]
+        return [future.result() for future in futures]
+
+def _evaluation_messages(prompt):
+    return [
+        {
+            "role": "system",
+            "content": "You are an educational assessment expert. Always respond with valid JSON that consolidates detailed feedback into concise summaries."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+def _evaluation_completion(client, prompt):
+    def attempt(model, sample, small):
         # Call Groq API
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an educational assessment expert. Always respond with valid JSON that consolidates detailed feedback into concise summaries."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="llama-3.3-70b-versatile",
+        chat_completion = create_chat_completion(
+            client,
+            messages=_evaluation_messages(prompt),
+            model=model,
             temperature=0.3,
-            max_tokens=1024,
+            max_tokens=EVALUATION_MAX_TOKENS,
             response_format={"type": "json_object"}
         )
 
         # Extract and parse the JSON response
         result_string = chat_completion.choices[0].message.content
         result = json.loads(result_string)
-
-        return jsonify({
-            "success": True,
+        return {
             "overall_strengths": result.get("overall_strengths", ""),
             "overall_improvements": result.get("overall_improvements", ""),
             "overall_suggestions": result.get("overall_suggestions", "")
+        }
+
+    result, _ = model_routing.route("student_evaluate", attempt, model_routing.check_summary)
+    return result
+
+@app.route('/student_evaluate', methods=['POST'])
+def student_evaluate():
+    """
+    Generate consolidated evaluation summary from individual question feedback
+    Expected JSON body:
+    {
+        "strengths": ["• You correctly identified...", "• Great understanding of..."],
+        "improvements": ["• Need to be more specific about...", "• Consider explaining..."],
+        "suggestions": ["• Review the fundamentals of...", "• Practice more examples..."]
+    }
+
+    Incremental mode (partial summaries are stored per student and only
+    questions whose feedback changed are re-summarized):
+    {
+        "student_id": "student-42",
+        "questions": {
+            "q1": {"strengths": [...], "improvements": [...], "suggestions": [...]},
+            "q2": null  (removes q2)
+        },
+        "replace": false (optional, drop stored questions not listed)
+    }
+    """
+    try:
+        data = request.json
+        student_id = data.get('student_id')
+
+        if student_id is not None:
+            return _student_evaluate_incremental(str(student_id), data)
+
+        strengths = data.get('strengths', [])
+        improvements = data.get('improvements', [])
+        suggestions = data.get('suggestions', [])
+
+        if not strengths and not improvements and not suggestions:
+            return jsonify({"error": "At least one of strengths, improvements, or suggestions is required"}), 400
+
+        feedback = {
+            "strengths": strengths,
+            "improvements": improvements,
+            "suggestions": suggestions
+        }
+        try:
+            evaluation_store.validate_feedback(feedback)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Get Groq client
+        client = get_groq_client()
+
+        prompt_tokens = token_budget.count_message_tokens(_evaluation_messages(_summary_prompt(feedback)))
+        if prompt_tokens + EVALUATION_MAX_TOKENS <= token_budget.MAX_REQUEST_TOKENS:
+            result = summarize_feedback(client, feedback)
+        else:
+            # Too large for one request: summarize map-reduce style over chunks
+            result = _summarize_in_chunks(client, feedback)
+
+        return jsonify({
+            "success": True,
+            **result
         }), 200
 
+    except token_budget.RequestTooLarge as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 413
+
     except Exception as e:
+        metrics.record_error(e)
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+def _summarize_in_chunks(client, feedback):
+    """Summarize feedback too large for one request in parts that each fit, then merge them"""
+    overhead = token_budget.count_message_tokens(_evaluation_messages(_summary_prompt({})))
+    available = max(1, token_budget.MAX_REQUEST_TOKENS - EVALUATION_MAX_TOKENS - overhead)
+
+    state = evaluation_store.new_state()
+    evaluation_store.merge_feedback(
+        state, evaluation_store.pack_feedback(feedback, available, token_budget.count_tokens)
+    )
+    result, _ = evaluation_store.summarize(
+        state,
+        lambda chunk: summarize_feedback(client, chunk),
+        lambda summaries: merge_summaries(client, summaries),
+        # One part per chunk: parts are already sized to fit a request
+        chunk_bullets=1,
+        run_all=_run_parallel
+    )
+    return result
+
+def _student_evaluate_incremental(student_id, data):
+    questions = data.get('questions')
+    if not isinstance(questions, dict):
+        return jsonify({"error": "questions must be an object mapping question ids to feedback"}), 400
+
+    with summary_store.lock(student_id):
+        state = summary_store.get(student_id)
+        try:
+            changed = evaluation_store.merge_feedback(state, questions, replace=data.get('replace', False))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not state["questions"]:
+            return jsonify({"error": "At least one question with feedback is required"}), 400
+
+        # Get Groq client
+        client = get_groq_client()
+
+        result, stats = evaluation_store.summarize(
+            state,
+            lambda feedback: summarize_feedback(client, feedback),
+            lambda summaries: merge_summaries(client, summaries),
+            run_all=_run_parallel
+        )
+        summary_store.put(student_id, state)
+
+    metrics.registry.set_gauge("summary_store_students", len(summary_store), service="llm")
+    metrics.registry.inc("summary_cache_reused_total", stats["reused"], service="llm")
+    metrics.registry.inc("summary_cache_computed_total", stats["map_calls"] + stats["reduce_calls"], service="llm")
+
+    return jsonify({
+        "success": True,
+        "student_id": student_id,
+        **result,
+        "questions": len(state["questions"]),
+        "changed_questions": changed,
+        "summary_stats": stats
+    }), 200
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,87 @@
+"""
+Splitting the OCR text of an answer sheet into per-question answers.
+
+A new answer starts at a line beginning with a question marker: "Q3:",
+"Question 3.", "q3)" and so on. Bare numbers ("2.", "3)") are usually
+numbered points inside one answer, so they only count as markers when the
+caller opts in (bare_numbers=True), and then only for the next expected
+question. Text before the first marker (name, class, date headers) is
+dropped, unless there is only one question and no marker at all. Kept
+separate from scan_pipeline.py so it can be used without
+loading the OCR model.
+"""
+import re
+
+PREFIXED_MARKER_RE = re.compile(r"^\s*Q(?:uestion)?\s*(\d{1,3})\b\s*[.):\-]?\s*", re.IGNORECASE)
+BARE_MARKER_RE = re.compile(r"^\s*(\d{1,3})\s*[.):\-]\s*")
+
+
+class AnswerSegmenter:
+    """
+    Incrementally assigns OCR lines to questions by their leading question
+    number. feed() returns the indexes of questions whose answers became
+    complete (a later question's marker was seen); finish() returns the rest.
+
+    Prefixed markers may skip ahead (unanswered questions); bare numbers
+    must be the next question. Markers for earlier questions are kept as
+    text of the current answer.
+    """
+
+    def __init__(self, question_count, bare_numbers=False):
+        self.question_count = question_count
+        self.bare_numbers = bare_numbers
+        self.answers = [[] for _ in range(question_count)]
+        self.current = None
+        self.preamble = []
+        self.seen_marker = False
+        self.emitted = set()
+
+    def _marker(self, line):
+        """Return (question index, match) if the line starts a new answer, else None."""
+        current = -1 if self.current is None else self.current
+        match = PREFIXED_MARKER_RE.match(line)
+        if match:
+            index = int(match.group(1)) - 1
+            if current < index < self.question_count:
+                return index, match
+            return None
+        if self.bare_numbers:
+            match = BARE_MARKER_RE.match(line)
+            if match and int(match.group(1)) - 1 == current + 1 < self.question_count:
+                return current + 1, match
+        return None
+
+    def feed(self, lines):
+        completed = []
+        for line in lines:
+            marker = self._marker(line)
+            if marker is not None:
+                index, match = marker
+                self.seen_marker = True
+                # Everything before this marker is finished
+                for previous in range(index):
+                    if previous not in self.emitted:
+                        completed.append(previous)
+                        self.emitted.add(previous)
+                self.current = index
+                line = line[match.end():]
+            elif self.current is None:
+                # Before the first marker: usually a header, kept aside
+                if line.strip():
+                    self.preamble.append(line)
+                continue
+            if line.strip():
+                self.answers[self.current].append(line)
+        return completed
+
+    def finish(self):
+        if not self.seen_marker and self.question_count == 1:
+            # A single question needs no marker: all text is its answer.
+            # With several questions and no markers, answers stay empty.
+            self.answers[0] = self.preamble
+        remaining = [i for i in range(self.question_count) if i not in self.emitted]
+        self.emitted.update(remaining)
+        return remaining
+
+    def answer(self, index):
+        return "\n".join(self.answers[index])
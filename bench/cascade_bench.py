@@ -0,0 +1,144 @@
+"""
+Cost, latency and grading accuracy of the /grade model cascade against
+large-model-only routing, on a labeled set of answers, using the local
+mock Groq API.
+
+The mock grades with the large model exactly (score = label) and with the
+small model with Gaussian score noise, roughly calibrated self-reported
+confidence and occasional truncated JSON (see MOCK_SMALL_* in
+bench/mock_groq.py), so accuracy numbers measure the routing, not a model.
+
+Modes:
+    large_only      every request on the large model (the original behaviour)
+    cascade         small model first, escalate on borderline score, low
+                    confidence or invalid output (the default policy)
+    cascade_2sample cascade plus a second small-model sample that must agree
+    small_only      every request on the small model (lower bound on cost)
+
+Cost uses Groq on-demand prices in USD per 1M tokens (input, output).
+
+Usage:
+    python bench/cascade_bench.py [--labels bench/labeled_grades.jsonl] [--repeat 3] [-o result.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MOCK_PORT = int(os.environ.get("MOCK_PORT", 8766))
+os.environ.setdefault("MOCK_LATENCY_MEDIAN_MS", "400")
+os.environ.setdefault("MOCK_LATENCY_SIGMA", "0.3")
+os.environ.setdefault("MOCK_SEED", "7")
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{MOCK_PORT}"
+os.environ.setdefault("GROQ_API_KEY", "mock")
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import mock_groq  # noqa: E402
+from percentiles import percentile  # noqa: E402
+import LLM_main  # noqa: E402
+import model_routing  # noqa: E402
+from metrics import registry  # noqa: E402
+
+PRICES_PER_MILLION = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79)
+}
+
+MODES = {
+    "large_only": {"grade": {"strategy": "large"}},
+    "cascade": {},
+    "cascade_2sample": {"grade": {"second_sample": True}},
+    "small_only": {"grade": {"strategy": "small"}}
+}
+
+
+def load_labels(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def token_cost():
+    cost = 0.0
+    for model, (input_price, output_price) in PRICES_PER_MILLION.items():
+        cost += registry.total("llm_prompt_tokens_total", model=model) * input_price / 1e6
+        cost += registry.total("llm_completion_tokens_total", model=model) * output_price / 1e6
+    return cost
+
+
+def run_mode(client, items, repeat):
+    registry.reset()
+    latencies, errors, failed = [], [], 0
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            response = client.post('/grade', json={
+                "question": item["question"], "student_answer": item["student_answer"]
+            })
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                # Unparseable output with no model to escalate to
+                failed += 1
+                continue
+            errors.append(abs(response.json["score"] - item["score"]))
+
+    requests_total = len(latencies)
+    latencies.sort()
+    return {
+        "requests": requests_total,
+        "failed": failed,
+        "escalated_fraction": round(registry.total("llm_route_total", escalated="true") / requests_total, 3),
+        "llm_calls_per_request": round(registry.total("llm_requests_total") / requests_total, 2),
+        "mean_ms": round(statistics.mean(latencies), 1),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "mae": round(statistics.mean(errors), 2),
+        "within_10_points": round(sum(e <= 10 for e in errors) / len(errors), 3),
+        "cost_per_1k_requests_usd": round(token_cost() / requests_total * 1000, 4)
+    }
+
+
+def run(items, repeat):
+    client = LLM_main.app.test_client()
+    results = {}
+    for mode, overrides in MODES.items():
+        model_routing.set_policies(overrides)
+        results[mode] = run_mode(client, items, repeat)
+    model_routing.set_policies({})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare /grade model routing policies.")
+    parser.add_argument("--labels", default=os.path.join(REPO_ROOT, "bench", "labeled_grades.jsonl"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    server = make_server("127.0.0.1", MOCK_PORT, mock_groq.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        results = run(load_labels(args.labels), args.repeat)
+    finally:
+        server.shutdown()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(f"{'mode':<16} {'escalated':>9} {'calls/req':>9} {'mean ms':>8} {'p95 ms':>8} "
+          f"{'MAE':>6} {'<=10pt':>7} {'failed':>6} {'$/1k req':>9}")
+    for mode, r in results.items():
+        print(f"{mode:<16} {r['escalated_fraction']:>9} {r['llm_calls_per_request']:>9} {r['mean_ms']:>8} "
+              f"{r['p95_ms']:>8} {r['mae']:>6} {r['within_10_points']:>7} {r['failed']:>6} {r['cost_per_1k_requests_usd']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Local mock of the Groq chat completions API for benchmarks.
+
+Simulates response latency (log-normal around a configurable median) and
+rate limiting (429 with a retry-after header), and returns OpenAI-shaped
+responses with a `usage` block so the services behave as they would
+against the real API.
+
+Point a service at it with:
+    GROQ_BASE_URL=http://localhost:8000 GROQ_API_KEY=mock python LLM_main.py
+
+Configuration (environment variables):
+    MOCK_LATENCY_MEDIAN_MS   median response latency (default 400)
+    MOCK_LATENCY_SIGMA       log-normal sigma of the latency (default 0.5)
+    MOCK_MS_PER_1K_TOKENS    extra latency per 1,000 prompt tokens (default 0)
+    MOCK_RATE_LIMIT_PROB     probability of answering 429 (default 0.0)
+    MOCK_RETRY_AFTER_S       retry-after header sent with 429s (default 1)
+    MOCK_SEED                random seed (default unset)
+
+Small models (names containing "8b" or "instant") answer faster but grade
+less reliably, to exercise the model cascade:
+    MOCK_SMALL_LATENCY_MEDIAN_MS  median latency of small models (default 120)
+    MOCK_SMALL_SCORE_NOISE        std-dev of small-model score error (default 15)
+    MOCK_SMALL_INVALID_PROB       probability of malformed JSON (default 0.03)
+
+The large model's grade is a deterministic function of the answer length
+(see reference_score), which benchmarks use as the label.
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+
+from flask import Flask, request, jsonify
+
+app = Flask(__name__)
+
+LATENCY_MEDIAN_MS = float(os.environ.get("MOCK_LATENCY_MEDIAN_MS", 400))
+LATENCY_SIGMA = float(os.environ.get("MOCK_LATENCY_SIGMA", 0.5))
+MS_PER_1K_TOKENS = float(os.environ.get("MOCK_MS_PER_1K_TOKENS", 0))
+RATE_LIMIT_PROB = float(os.environ.get("MOCK_RATE_LIMIT_PROB", 0.0))
+RETRY_AFTER_S = os.environ.get("MOCK_RETRY_AFTER_S", "1")
+SMALL_LATENCY_MEDIAN_MS = float(os.environ.get("MOCK_SMALL_LATENCY_MEDIAN_MS", 120))
+SMALL_SCORE_NOISE = float(os.environ.get("MOCK_SMALL_SCORE_NOISE", 15))
+SMALL_INVALID_PROB = float(os.environ.get("MOCK_SMALL_INVALID_PROB", 0.03))
+
+_rng = random.Random(os.environ.get("MOCK_SEED"))
+_rng_lock = threading.Lock()
+_stats = {"requests": 0, "rate_limited": 0}
+
+
+def _next_request():
+    """Count a request and draw its random rate-limit and latency samples."""
+    with _rng_lock:
+        _stats["requests"] += 1
+        return _stats["requests"], _rng.random(), _rng.gauss(0, 1)
+
+
+def is_small_model(model):
+    return "8b" in model or "instant" in model
+
+
+def reference_score(answer):
+    """The large model's (and the labels') score for an answer."""
+    return min(100, 40 + len(answer.split()) * 5)
+
+
+def approx_tokens(text):
+    """Rough token count (about 4 characters per token)."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _extract(prompt, marker, stop=None):
+    if marker not in prompt:
+        return ""
+    text = prompt.split(marker, 1)[1]
+    if stop and stop in text:
+        text = text.split(stop, 1)[0]
+    return text.strip()
+
+
+def fake_completion(messages, json_mode, model=""):
+    """Build a plausible response body for the services' prompts."""
+    prompt = messages[-1]["content"] if messages else ""
+    system = messages[0]["content"] if len(messages) > 1 else ""
+    small = is_small_model(model)
+
+    if json_mode and "overall_strengths" in prompt:
+        return json.dumps({
+            "overall_strengths": "The student shows a solid grasp of the core concepts.",
+            "overall_improvements": "Answers need more specific supporting detail.",
+            "overall_suggestions": "Review key definitions and practice worked examples."
+        })
+
+    if json_mode:
+        answer = _extract(prompt, "Student's Answer:", "Please provide:")
+        score = reference_score(answer)
+        confidence = 0.95
+        if small:
+            with _rng_lock:
+                invalid = _rng.random() < SMALL_INVALID_PROB
+                error = _rng.gauss(0, SMALL_SCORE_NOISE)
+                confidence_noise = _rng.gauss(0, 0.1)
+            if invalid:
+                return '{"score": '
+            score = int(min(100, max(0, round(score + error))))
+            # Roughly calibrated: larger errors come with lower confidence
+            confidence = round(min(1.0, max(0.0, 1 - abs(error) / 40 + confidence_noise)), 2)
+        result = {
+            "score": score,
+            "feedback_correct": "Identifies the main idea.",
+            "feedback_incorrect": "Missing supporting detail.",
+            "suggestions": "Expand the explanation with an example.",
+            "corrected_answer": answer or "N/A"
+        }
+        if "confidence" in system:
+            result["confidence"] = confidence
+        return json.dumps(result)
+
+    ocr_text = _extract(prompt, "OCR Text to correct:", "Please provide the corrected text")
+    if ocr_text:
+        return ocr_text
+    return _extract(prompt, "Student's Answer:", "Provide a clear") or "OK"
+
+
+@app.route('/openai/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    data = request.json or {}
+    request_id, uniform, normal = _next_request()
+
+    if uniform < RATE_LIMIT_PROB:
+        with _rng_lock:
+            _stats["rate_limited"] += 1
+        response = jsonify({"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}})
+        response.status_code = 429
+        response.headers["retry-after"] = RETRY_AFTER_S
+        return response
+
+    messages = data.get("messages", [])
+    json_mode = (data.get("response_format") or {}).get("type") == "json_object"
+    model = data.get("model", "mock")
+    content = fake_completion(messages, json_mode, model)
+    prompt_tokens = sum(approx_tokens(m.get("content", "")) for m in messages)
+
+    median_ms = SMALL_LATENCY_MEDIAN_MS if is_small_model(model) else LATENCY_MEDIAN_MS
+    latency_ms = median_ms * math.exp(LATENCY_SIGMA * normal) + MS_PER_1K_TOKENS * prompt_tokens / 1000
+    time.sleep(latency_ms / 1000)
+
+    completion_tokens = min(approx_tokens(content), data.get("max_tokens") or 1 << 30)
+    return jsonify({
+        "id": f"chatcmpl-mock-{request_id}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }), 200
+
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify(_stats), 200
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 8000))
+    print(f"Starting mock Groq API on port {port}")
+    app.run(host='0.0.0.0', port=port, threaded=True)
@@ -0,0 +1,138 @@
+"""
+OCR latency over a mixed-resolution workload, with and without input-shape
+bucketing (OCR_SHAPE_BUCKETS) and start-up warm-up (OCR_WARMUP).
+
+The repo's sample images are resized to a seeded set of page resolutions
+and sent in shuffled order, each size several times, through the same
+preprocess + extract_text path as /perform_ocr. Each mode runs in its own
+process so TensorFlow's per-shape caches start empty. Reports start-up
+time, p50/p95/p99/max latency, the mean latency of the first request at a
+new resolution versus repeats, and whether both modes extracted the same
+lines.
+
+Needs the OCR dependencies (requirements_ocr.txt) and models/ocr_fine_tuned.h5.
+
+Usage:
+    python bench/ocr_shapes_bench.py [--sizes 12] [--repeat 4] [-o result.json]
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from percentiles import percentile  # noqa: E402
+
+MODES = {
+    "unbucketed": {"OCR_SHAPE_BUCKETS": "", "OCR_WARMUP": "0"},
+    "bucketed": {}
+}
+
+
+def make_workload(sizes, repeat, seed):
+    """Return a shuffled list of (sample path, width, height), `repeat` per size."""
+    rng = random.Random(seed)
+    samples = sorted(glob.glob(os.path.join(REPO_ROOT, "image_ocr", "*.png")))
+    workload = []
+    for _ in range(sizes):
+        width = rng.randint(320, 1600)
+        height = int(width * rng.uniform(0.6, 1.6))
+        sample = rng.choice(samples)
+        workload.extend([(sample, width, height)] * repeat)
+    rng.shuffle(workload)
+    return workload
+
+
+def worker(workload, output_path):
+    """Run the workload in this process and write latencies and texts as JSON."""
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(REPO_ROOT)
+    import cv2
+
+    start = time.perf_counter()
+    import kerasOCR
+    startup_s = time.perf_counter() - start
+
+    seen, records = set(), []
+    for sample, width, height in workload:
+        image = cv2.resize(cv2.imread(sample), (width, height), interpolation=cv2.INTER_AREA)
+        start = time.perf_counter()
+        text = kerasOCR.extract_text(kerasOCR.preprocess_for_ocr(image_array=image))
+        records.append({
+            "size": f"{width}x{height}",
+            "sample": os.path.basename(sample),
+            "first": (width, height) not in seen,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "text": text
+        })
+        seen.add((width, height))
+
+    with open(output_path, "w") as f:
+        json.dump({"startup_s": startup_s, "records": records}, f)
+
+
+def summarize(run):
+    latencies = sorted(r["latency_ms"] for r in run["records"])
+    first = [r["latency_ms"] for r in run["records"] if r["first"]]
+    repeats = [r["latency_ms"] for r in run["records"] if not r["first"]]
+    return {
+        "startup_s": round(run["startup_s"], 1),
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies), 1),
+        "first_at_size_mean_ms": round(sum(first) / len(first), 1),
+        "repeat_mean_ms": round(sum(repeats) / len(repeats), 1) if repeats else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR latency with and without shape bucketing.")
+    parser.add_argument("--sizes", type=int, default=12, help="Distinct image resolutions")
+    parser.add_argument("--repeat", type=int, default=4, help="Requests per resolution")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    workload = make_workload(args.sizes, args.repeat, args.seed)
+    if args.worker:
+        worker(workload, args.worker)
+        return 0
+
+    runs = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, env in MODES.items():
+            output_path = os.path.join(tmp, f"{mode}.json")
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--sizes", str(args.sizes),
+                            "--repeat", str(args.repeat), "--seed", str(args.seed), "--worker", output_path],
+                           env={**os.environ, **env}, check=True)
+            with open(output_path) as f:
+                runs[mode] = json.load(f)
+
+    results = {mode: summarize(run) for mode, run in runs.items()}
+    pairs = list(zip(runs["unbucketed"]["records"], runs["bucketed"]["records"]))
+    results["same_text_fraction"] = round(sum(a["text"] == b["text"] for a, b in pairs) / len(pairs), 3)
+    results["differences"] = [
+        {"size": a["size"], "sample": a["sample"], "unbucketed": a["text"], "bucketed": b["text"]}
+        for a, b in pairs if a["text"] != b["text"]
+    ][:5]
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
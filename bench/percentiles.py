@@ -0,0 +1,12 @@
+"""
+Latency percentile shared by the benchmark scripts.
+"""
+import math
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p * len(sorted_values) / 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
@@ -0,0 +1,118 @@
+"""
+End-to-end latency per answer sheet: chained service calls versus the
+single /scan_grade pipeline endpoint.
+
+Chained: POST each page to /perform_ocr, its text to /adjust_ocr,
+then each answer to /grade (one question per page, as the frontend does).
+Pipeline: one multipart POST to /scan_grade, reading the streamed events.
+
+Both paths need the services running (point LLM_main.py and scan_pipeline.py
+at bench/mock_groq.py to exclude Groq variance):
+    python bench/pipeline_bench.py --pages image_ocr/all_answers.png \\
+        --questions "What is photosynthesis?" --repeat 10 -o result.json
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def chained(session, args, images, questions):
+    answers = []
+    for image in images:
+        response = session.post(args.ocr_url + "/perform_ocr",
+                                json={"image": base64.b64encode(image).decode("ascii")}, timeout=args.timeout)
+        response.raise_for_status()
+        answers.append("\n".join(response.json()["extracted_text"]))
+
+    results = []
+    for question, answer in zip(questions, answers):
+        response = session.post(args.llm_url + "/adjust_ocr", json={"ocr_text": answer}, timeout=args.timeout)
+        response.raise_for_status()
+        corrected = response.json()["corrected_text"]
+        response = session.post(args.llm_url + "/grade",
+                                json={"question": question, "student_answer": corrected}, timeout=args.timeout)
+        response.raise_for_status()
+        results.append(response.json())
+    return results
+
+
+def pipeline(session, args, images, questions):
+    files = [("pages", (f"page{i}.png", image, "image/png")) for i, image in enumerate(images)]
+    data = {"questions": json.dumps([{"question": q} for q in questions]), "page_per_question": "true"}
+    response = session.post(args.pipeline_url + "/scan_grade", files=files, data=data,
+                            stream=True, timeout=args.timeout)
+    response.raise_for_status()
+    results = []
+    for line in response.iter_lines():
+        if line:
+            event = json.loads(line)
+            if event["event"] == "grade":
+                results.append(event)
+    return results
+
+
+def time_runs(fn, repeat, *fn_args):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*fn_args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "runs": repeat,
+        "mean_ms": round(statistics.mean(latencies), 1),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "max_ms": round(latencies[-1], 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chained OCR/LLM calls with /scan_grade.")
+    parser.add_argument("--pages", nargs="+", required=True, help="Page images, one answer per page")
+    parser.add_argument("--questions", nargs="+", required=True, help="One question per page")
+    parser.add_argument("--llm-url", default="http://localhost:5000")
+    parser.add_argument("--ocr-url", default="http://localhost:5002")
+    parser.add_argument("--pipeline-url", default="http://localhost:5003")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    if len(args.pages) != len(args.questions):
+        parser.error("--pages and --questions must have the same length")
+
+    images = []
+    for path in args.pages:
+        with open(os.path.join(REPO_ROOT, path), "rb") as f:
+            images.append(f.read())
+
+    session = requests.Session()
+    # Warm up both paths once (model load, connection setup)
+    chained(session, args, images, args.questions)
+    pipeline(session, args, images, args.questions)
+
+    result = {
+        "pages": len(images),
+        "chained": time_runs(chained, args.repeat, session, args, images, args.questions),
+        "pipeline": time_runs(pipeline, args.repeat, session, args, images, args.questions)
+    }
+    result["speedup"] = round(result["chained"]["mean_ms"] / result["pipeline"]["mean_ms"], 2)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Replay a JSONL corpus of requests against the services and report
+throughput, latency percentiles and error rates.
+
+Each corpus line is a JSON object:
+    {"endpoint": "/grade", "body": {"question": "...", "student_answer": "..."}}
+    {"endpoint": "/perform_ocr", "image": "image_ocr/all_answers.png"}
+
+/perform_ocr requests are sent to --ocr-url (image paths are resolved
+relative to the repository root and sent as base64 JSON); everything else
+goes to --llm-url.
+
+Examples:
+    # closed loop: 8 concurrent clients, 200 requests
+    python bench/replay.py bench/corpus.jsonl --concurrency 8 --requests 200 -o result.json
+
+    # open loop: 5 requests/second for 60 seconds
+    python bench/replay.py bench/corpus.jsonl --rate 5 --duration 60 -o result.json
+
+    # compare against a previous run, fail if p95 regressed by more than 10%
+    python bench/replay.py bench/corpus.jsonl --requests 200 -o new.json --compare old.json
+"""
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from percentiles import percentile  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OCR_ENDPOINTS = {"/perform_ocr"}
+
+
+def load_corpus(path):
+    """Load corpus entries and pre-encode any referenced images."""
+    entries = []
+    image_cache = {}
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line)
+            if "endpoint" not in entry:
+                raise ValueError(f"{path}:{line_number}: missing 'endpoint'")
+
+            body = entry.get("body", {})
+            if "image" in entry:
+                image_path = os.path.join(REPO_ROOT, entry["image"])
+                if image_path not in image_cache:
+                    with open(image_path, "rb") as image_file:
+                        image_cache[image_path] = base64.b64encode(image_file.read()).decode("ascii")
+                body = dict(body, image=image_cache[image_path])
+
+            entries.append({"endpoint": entry["endpoint"], "body": body})
+    if not entries:
+        raise ValueError(f"{path}: corpus is empty")
+    return entries
+
+
+def summarize(samples, wall_time):
+    """Aggregate (endpoint, latency_s, status) samples into result stats."""
+    def stats(group):
+        latencies = sorted(latency for _, latency, _ in group)
+        errors = sum(1 for _, _, status in group if status is None or status >= 400)
+        status_counts = {}
+        for _, _, status in group:
+            key = str(status) if status is not None else "connection_error"
+            status_counts[key] = status_counts.get(key, 0) + 1
+        return {
+            "requests": len(group),
+            "errors": errors,
+            "error_rate": errors / len(group) if group else 0.0,
+            "status_counts": status_counts,
+            "throughput_rps": len(group) / wall_time if wall_time else 0.0,
+            "latency_ms": {
+                "mean": sum(latencies) / len(latencies) * 1000 if latencies else None,
+                "p50": percentile(latencies, 50) * 1000 if latencies else None,
+                "p95": percentile(latencies, 95) * 1000 if latencies else None,
+                "p99": percentile(latencies, 99) * 1000 if latencies else None,
+                "max": latencies[-1] * 1000 if latencies else None
+            }
+        }
+
+    by_endpoint = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample[0], []).append(sample)
+
+    return {
+        "overall": stats(samples),
+        "endpoints": {endpoint: stats(group) for endpoint, group in sorted(by_endpoint.items())}
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Replayer:
+    def __init__(self, entries, llm_url, ocr_url, timeout):
+        self.entries = entries
+        self.llm_url = llm_url.rstrip("/")
+        self.ocr_url = ocr_url.rstrip("/")
+        self.timeout = timeout
+        self.samples = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def send(self, index, scheduled_at=None):
+        """
+        Send corpus entry `index` (wrapping around). In open-loop mode latency
+        is measured from the scheduled send time, so queueing delay counts.
+        """
+        entry = self.entries[index % len(self.entries)]
+        base_url = self.ocr_url if entry["endpoint"] in OCR_ENDPOINTS else self.llm_url
+        start = scheduled_at if scheduled_at is not None else time.perf_counter()
+        try:
+            response = self._session().post(base_url + entry["endpoint"], json=entry["body"], timeout=self.timeout)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.samples.append((entry["endpoint"], latency, status))
+
+    def run_closed_loop(self, concurrency, total_requests, duration):
+        counter = iter(range(sys.maxsize))
+        counter_lock = threading.Lock()
+        deadline = time.perf_counter() + duration if duration else None
+
+        def worker():
+            while True:
+                with counter_lock:
+                    index = next(counter)
+                if total_requests and index >= total_requests:
+                    return
+                if deadline and time.perf_counter() >= deadline:
+                    return
+                self.send(index)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_open_loop(self, rate, total_requests, duration, max_workers):
+        if not total_requests:
+            total_requests = int(rate * duration)
+        interval = 1.0 / rate
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for index in range(total_requests):
+                scheduled_at = start + index * interval
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.send, index, scheduled_at)
+
+
+def compare(result, baseline, max_regression):
+    """Print per-endpoint deltas; return False if any p95 or error rate regressed."""
+    ok = True
+    print(f"{'endpoint':<20} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18} {'error rate':>18}")
+    endpoints = sorted(set(result["endpoints"]) | set(baseline["endpoints"]))
+    for endpoint in ["overall"] + endpoints:
+        new = result["overall"] if endpoint == "overall" else result["endpoints"].get(endpoint)
+        old = baseline["overall"] if endpoint == "overall" else baseline["endpoints"].get(endpoint)
+        if not new or not old:
+            print(f"{endpoint:<20} (missing in one of the runs)")
+            continue
+
+        cells = []
+        for key in ("p50", "p95", "p99"):
+            a, b = old["latency_ms"][key], new["latency_ms"][key]
+            if a is None or b is None:
+                cells.append(f"{'-':>18}")
+                continue
+            change = (b - a) / a if a else 0.0
+            cells.append(f"{a:8.1f}->{b:8.1f}".rjust(18))
+            if key == "p95" and change > max_regression:
+                ok = False
+        cells.append(f"{old['error_rate']:7.2%}->{new['error_rate']:7.2%}".rjust(18))
+        if new["error_rate"] > old["error_rate"] + 0.01:
+            ok = False
+        print(f"{endpoint:<20} " + " ".join(cells))
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a JSONL request corpus and report latency/throughput.")
+    parser.add_argument("corpus", help="Path to the JSONL corpus")
+    parser.add_argument("--llm-url", default=os.environ.get("LLM_URL", "http://localhost:5000"))
+    parser.add_argument("--ocr-url", default=os.environ.get("OCR_URL", "http://localhost:5002"))
+    parser.add_argument("--concurrency", type=int, default=4, help="Closed-loop client count (ignored with --rate)")
+    parser.add_argument("--rate", type=float, help="Open-loop send rate in requests/second")
+    parser.add_argument("--requests", type=int, default=0, help="Total requests to send (default: one pass over the corpus)")
+    parser.add_argument("--duration", type=float, default=0, help="Run length in seconds")
+    parser.add_argument("--max-workers", type=int, default=64, help="Open-loop in-flight request cap")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("-o", "--output", help="Write the JSON result file here")
+    parser.add_argument("--compare", help="Baseline result file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed relative p95 increase before --compare fails (default 0.10)")
+    args = parser.parse_args(argv)
+
+    entries = load_corpus(args.corpus)
+    total_requests = args.requests
+    if not total_requests and not args.duration:
+        total_requests = len(entries)
+
+    replayer = Replayer(entries, args.llm_url, args.ocr_url, args.timeout)
+    start = time.perf_counter()
+    if args.rate:
+        replayer.run_open_loop(args.rate, total_requests, args.duration, args.max_workers)
+    else:
+        replayer.run_closed_loop(args.concurrency, total_requests, args.duration)
+    wall_time = time.perf_counter() - start
+
+    result = summarize(replayer.samples, wall_time)
+    result["meta"] = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "corpus": args.corpus,
+        "mode": "open_loop" if args.rate else "closed_loop",
+        "rate": args.rate,
+        "concurrency": None if args.rate else args.concurrency,
+        "wall_time_s": wall_time
+    }
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.max_regression):
+            print("Regression detected")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
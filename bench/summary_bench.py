@@ -0,0 +1,116 @@
+"""
+Compare prompt tokens and latency of /student_evaluate summarization modes
+for 10, 100 and 1,000 feedback bullets, against the local mock Groq API.
+
+Modes:
+    single_shot          one prompt containing every bullet (the original behaviour)
+    endpoint             /student_evaluate without student_id (map-reduce above the chunk size)
+    incremental_initial  /student_evaluate with student_id, first submission
+    incremental_update   same student after one question's feedback changes
+
+Usage:
+    python bench/summary_bench.py [-o result.json] [--sizes 10,100,1000]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MOCK_PORT = int(os.environ.get("MOCK_PORT", 8765))
+# Make the mock's latency grow with prompt size like a real model's prefill
+os.environ.setdefault("MOCK_LATENCY_MEDIAN_MS", "50")
+os.environ.setdefault("MOCK_LATENCY_SIGMA", "0")
+os.environ.setdefault("MOCK_MS_PER_1K_TOKENS", "100")
+os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{MOCK_PORT}"
+os.environ.setdefault("GROQ_API_KEY", "mock")
+
+from werkzeug.serving import make_server  # noqa: E402
+
+import mock_groq  # noqa: E402
+import LLM_main  # noqa: E402
+from metrics import registry  # noqa: E402
+
+
+def make_questions(bullets):
+    """Build per-question feedback with one strength, improvement and suggestion each."""
+    questions = {}
+    for i in range(max(1, bullets // 3)):
+        questions[f"q{i}"] = {
+            "strengths": [f"• Question {i}: correctly identified the main concept and used relevant terminology."],
+            "improvements": [f"• Question {i}: needs to be more specific about the supporting evidence."],
+            "suggestions": [f"• Question {i}: review the relevant chapter and practice two more examples."]
+        }
+    return questions
+
+
+def measure(fn):
+    prompt_before = registry.total("llm_prompt_tokens_total")
+    calls_before = registry.total("llm_requests_total")
+    start = time.perf_counter()
+    fn()
+    return {
+        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        "prompt_tokens": registry.total("llm_prompt_tokens_total") - prompt_before,
+        "llm_calls": registry.total("llm_requests_total") - calls_before
+    }
+
+
+def run(sizes):
+    client = LLM_main.app.test_client()
+    groq_client = LLM_main.get_groq_client()
+    results = {}
+
+    for size in sizes:
+        questions = make_questions(size)
+        flat = {key: [b for q in questions.values() for b in q[key]]
+                for key in ("strengths", "improvements", "suggestions")}
+        student_id = f"bench-{size}-{time.time()}"
+
+        def post(body):
+            response = client.post('/student_evaluate', json=body)
+            assert response.status_code == 200, response.json
+
+        changed = dict(questions)
+        first = next(iter(changed))
+        changed[first] = dict(changed[first], improvements=["• Now also needs clearer structure."])
+
+        results[size] = {
+            "single_shot": measure(lambda: LLM_main.summarize_feedback(groq_client, flat)),
+            "endpoint": measure(lambda: post(flat)),
+            "incremental_initial": measure(lambda: post({"student_id": student_id, "questions": questions})),
+            "incremental_update": measure(lambda: post({"student_id": student_id, "questions": {first: changed[first]}}))
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    server = make_server("127.0.0.1", MOCK_PORT, mock_groq.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        results = run([int(s) for s in args.sizes.split(",")])
+    finally:
+        server.shutdown()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(f"{'bullets':>8} {'mode':<20} {'prompt tokens':>14} {'calls':>6} {'latency ms':>11}")
+    for size, modes in results.items():
+        for mode, r in modes.items():
+            print(f"{size:>8} {mode:<20} {r['prompt_tokens']:>14} {r['llm_calls']:>6} {r['latency_ms']:>11}")
+
+
+if __name__ == '__main__':
+    main()
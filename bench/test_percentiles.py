@@ -0,0 +1,18 @@
+import pytest
+
+from percentiles import percentile
+
+
+@pytest.mark.parametrize("values, p, expected", [
+    ([], 50, None),
+    ([7], 99, 7),
+    ([1, 2], 50, 1),
+    ([1, 2], 51, 2),
+    ([1, 2, 3, 4, 5], 95, 5),
+    ([1, 2, 3, 4, 5], 20, 1),
+    ([1, 2, 3, 4, 5], 0, 1),
+    (list(range(1, 101)), 95, 95),
+    (list(range(1, 101)), 99, 99),
+])
+def test_nearest_rank(values, p, expected):
+    assert percentile(values, p) == expected
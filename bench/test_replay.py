@@ -0,0 +1,48 @@
+from replay import compare, summarize
+
+
+def run(p95_ms, error_rate=0.0):
+    stats = {"latency_ms": {"p50": p95_ms / 2, "p95": p95_ms, "p99": p95_ms}, "error_rate": error_rate}
+    return {"overall": stats, "endpoints": {"/grade": stats}}
+
+
+def test_summarize_counts_connection_errors():
+    samples = [("/grade", 0.1, 200), ("/grade", 0.3, None), ("/grade", 0.2, 500), ("/ocr", 0.5, 200)]
+    result = summarize(samples, wall_time=2.0)
+
+    grade = result["endpoints"]["/grade"]
+    assert grade["errors"] == 2
+    assert grade["error_rate"] == 2 / 3
+    assert grade["status_counts"] == {"200": 1, "connection_error": 1, "500": 1}
+    assert grade["latency_ms"]["p50"] == 200
+    assert grade["latency_ms"]["max"] == 300
+    assert result["overall"]["requests"] == 4
+    assert result["overall"]["throughput_rps"] == 2.0
+
+
+def test_summarize_without_samples():
+    result = summarize([], wall_time=0)
+    assert result["overall"]["error_rate"] == 0.0
+    assert result["overall"]["latency_ms"]["p95"] is None
+    assert result["endpoints"] == {}
+
+
+def test_compare_p95_regression_threshold():
+    assert compare(run(109), run(100), max_regression=0.10) is True
+    assert compare(run(111), run(100), max_regression=0.10) is False
+    assert compare(run(50), run(100), max_regression=0.10) is True
+
+
+def test_compare_error_rate_increase():
+    assert compare(run(100, error_rate=0.005), run(100), max_regression=0.10) is True
+    assert compare(run(100, error_rate=0.05), run(100), max_regression=0.10) is False
+
+
+def test_compare_skips_endpoints_missing_from_one_run(capsys):
+    result, baseline = run(100), run(100)
+    result["endpoints"]["/new"] = run(10_000)["overall"]
+    del baseline["endpoints"]["/grade"]
+    assert compare(result, baseline, max_regression=0.10) is True
+    output = capsys.readouterr().out
+    assert "/grade               (missing in one of the runs)" in output
+    assert "/new                 (missing in one of the runs)" in output
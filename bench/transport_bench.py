@@ -0,0 +1,131 @@
+"""
+Bytes on the wire and server-side parse + decode time for the /perform_ocr
+image transports: base64 in JSON, raw binary body, and a framed batch.
+
+Runs in-process with the Flask test client against routes that parse the
+request the same way kerasOCR.py does (no OCR model needed). Uses the repo's
+sample images plus an A4 300 dpi scan-sized upscale of one of them.
+
+Usage:
+    python bench/transport_bench.py [--repeat 20] [-o result.json]
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import transport  # noqa: E402
+from image_io import decode_base64_image, decode_image_bytes  # noqa: E402
+
+app = Flask(__name__)
+
+
+@app.route('/json', methods=['POST'])
+def parse_json():
+    image = decode_base64_image(request.json['image'])
+    return jsonify({"shape": list(image.shape)})
+
+
+@app.route('/binary', methods=['POST'])
+def parse_binary():
+    image = decode_image_bytes(request.get_data(cache=False))
+    return jsonify({"shape": list(image.shape)})
+
+
+@app.route('/frames', methods=['POST'])
+def parse_frames():
+    frames = transport.unpack_frames(request.get_data(cache=False))
+    images = [decode_image_bytes(frame) for frame in frames]
+    return jsonify({"shapes": [list(image.shape) for image in images]})
+
+
+def load_images():
+    images = {}
+    for path in sorted(glob.glob(os.path.join(REPO_ROOT, "image_ocr", "*.png"))):
+        with open(path, "rb") as f:
+            images[os.path.basename(path)] = f.read()
+
+    # Scan-sized page: A4 at 300 dpi, encoded as JPEG like a phone/scanner upload
+    first = cv2.imdecode(np.frombuffer(next(iter(images.values())), dtype=np.uint8), cv2.IMREAD_COLOR)
+    page = cv2.resize(first, (2480, 3508), interpolation=cv2.INTER_CUBIC)
+    images["a4_300dpi.jpg"] = cv2.imencode(".jpg", page, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+    return images
+
+
+def time_request(client, repeat, *args, **kwargs):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.post(*args, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.data
+    latencies.sort()
+    return round(latencies[len(latencies) // 2], 2)
+
+
+def run(repeat):
+    client = app.test_client()
+    images = load_images()
+    results = {}
+
+    providers = [("stdlib", DefaultJSONProvider(app))]
+    if transport.orjson is not None:
+        providers.append(("orjson", transport.ORJSONProvider(app)))
+
+    for name, data in images.items():
+        body = json.dumps({"image": base64.b64encode(data).decode("ascii")}).encode("utf-8")
+        entry = {
+            "image_bytes": len(data),
+            "json_base64": {"wire_bytes": len(body)},
+            "binary": {"wire_bytes": len(data)}
+        }
+        for provider_name, provider in providers:
+            app.json = provider
+            entry["json_base64"][f"parse_ms_{provider_name}"] = time_request(
+                client, repeat, "/json", data=body, content_type="application/json")
+        entry["binary"]["parse_ms"] = time_request(
+            client, repeat, "/binary", data=data, content_type="application/octet-stream")
+        results[name] = entry
+
+    # One batch of every image versus one JSON request per image
+    batch = transport.pack_frames(list(images.values()))
+    app.json = providers[0][1]
+    results["batch_all_images"] = {
+        "frames": {
+            "wire_bytes": len(batch),
+            "parse_ms": time_request(client, repeat, "/frames", data=batch, content_type=transport.FRAMES_MIMETYPE)
+        },
+        "json_base64_per_image": {
+            "wire_bytes": sum(r["json_base64"]["wire_bytes"] for r in results.values()),
+            "parse_ms_stdlib": round(sum(r["json_base64"]["parse_ms_stdlib"] for r in results.values()), 2)
+        }
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare image transports for /perform_ocr.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    output = json.dumps(run(args.repeat), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
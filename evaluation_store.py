@@ -0,0 +1,288 @@
+"""
+Per-student storage and incremental map-reduce summarization of question
+feedback for /student_evaluate.
+
+Each student's state keeps the feedback for every question, a stable
+grouping of questions into chunks, and a cache of summaries keyed by a hash
+of their inputs. When feedback changes, only the chunks containing changed
+questions are re-summarized (map), and only the reduce steps above them are
+re-run; everything else is served from the cache.
+
+State layout:
+    {
+        "questions": {question_id: {"feedback": {...}, "hash": "..."}},
+        "chunks": [[question_id, ...], ...],
+        "cache": {summary_key: {"overall_strengths": ..., ...}}
+    }
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+FEEDBACK_KEYS = ("strengths", "improvements", "suggestions")
+
+# Maximum number of feedback bullets summarized in a single (map) call
+DEFAULT_CHUNK_BULLETS = int(os.environ.get("SUMMARY_CHUNK_BULLETS", 60))
+# Maximum number of partial summaries merged in a single (reduce) call
+DEFAULT_REDUCE_FANOUT = int(os.environ.get("SUMMARY_REDUCE_FANOUT", 8))
+
+
+def _hash(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def new_state():
+    return {"questions": {}, "chunks": [], "cache": {}}
+
+
+def count_bullets(feedback):
+    return sum(len(feedback.get(key, [])) for key in FEEDBACK_KEYS)
+
+
+def validate_feedback(feedback, name=None):
+    """Raise ValueError unless feedback is a dict of lists of strings."""
+    if not isinstance(feedback, dict):
+        raise ValueError(f"{name or 'feedback'} must be an object with strengths, improvements and suggestions lists")
+    for key in FEEDBACK_KEYS:
+        bullets = feedback.get(key, [])
+        if not isinstance(bullets, list) or not all(isinstance(b, str) for b in bullets):
+            raise ValueError(f"{name + '.' if name else ''}{key} must be a list of strings")
+
+
+def merge_feedback(state, questions, replace=False):
+    """
+    Merge {question_id: feedback} into the state. A feedback value of None
+    removes the question; with replace=True questions not listed are removed.
+    Returns the number of questions added, changed or removed. Raises
+    ValueError, leaving the state unchanged, if any feedback is malformed.
+    """
+    for question_id, feedback in questions.items():
+        if feedback is not None:
+            validate_feedback(feedback, name=str(question_id))
+
+    changed = 0
+    if replace:
+        for question_id in list(state["questions"]):
+            if question_id not in questions:
+                del state["questions"][question_id]
+                changed += 1
+
+    for question_id, feedback in questions.items():
+        question_id = str(question_id)
+        if feedback is None:
+            if state["questions"].pop(question_id, None) is not None:
+                changed += 1
+            continue
+
+        feedback = {key: list(feedback.get(key, [])) for key in FEEDBACK_KEYS}
+        feedback_hash = _hash(feedback)
+        existing = state["questions"].get(question_id)
+        if existing is None or existing["hash"] != feedback_hash:
+            state["questions"][question_id] = {"feedback": feedback, "hash": feedback_hash}
+            changed += 1
+    return changed
+
+
+def pack_feedback(feedback, max_tokens, count_tokens):
+    """
+    Split flat feedback lists into pseudo-questions {"part-0": feedback, ...}
+    of at most `max_tokens` each, measured with count_tokens plus one token
+    per line break, keeping bullet order. A bullet larger than max_tokens
+    gets a part of its own.
+    """
+    parts, current, current_tokens = [], None, 0
+    for key in FEEDBACK_KEYS:
+        for bullet in feedback.get(key, []):
+            tokens = count_tokens(bullet) + 1
+            if current is None or (current_tokens + tokens > max_tokens and count_bullets(current)):
+                current, current_tokens = {k: [] for k in FEEDBACK_KEYS}, 0
+                parts.append(current)
+            current[key].append(bullet)
+            current_tokens += tokens
+    return {f"part-{i}": part for i, part in enumerate(parts)}
+
+
+def assign_chunks(state, chunk_bullets=DEFAULT_CHUNK_BULLETS):
+    """
+    Group questions into chunks of at most `chunk_bullets` bullets. Existing
+    assignments are kept so that an edit only invalidates its own chunk; new
+    questions are appended to the last chunk while it has room.
+    """
+    questions = state["questions"]
+    chunks = [[q for q in chunk if q in questions] for chunk in state["chunks"]]
+    chunks = [chunk for chunk in chunks if chunk]
+    assigned = {q for chunk in chunks for q in chunk}
+
+    def size(chunk):
+        return sum(count_bullets(questions[q]["feedback"]) for q in chunk)
+
+    for question_id in questions:
+        if question_id in assigned:
+            continue
+        bullets = count_bullets(questions[question_id]["feedback"])
+        if chunks and size(chunks[-1]) + bullets <= chunk_bullets:
+            chunks[-1].append(question_id)
+        else:
+            chunks.append([question_id])
+
+    # Split chunks that edits have pushed over the limit
+    result = []
+    for chunk in chunks:
+        current, current_size = [], 0
+        for question_id in chunk:
+            bullets = count_bullets(questions[question_id]["feedback"])
+            if current and current_size + bullets > chunk_bullets:
+                result.append(current)
+                current, current_size = [], 0
+            current.append(question_id)
+            current_size += bullets
+        result.append(current)
+
+    state["chunks"] = result
+    return result
+
+
+def chunk_feedback(state, chunk):
+    """Concatenate the feedback lists of every question in a chunk."""
+    combined = {key: [] for key in FEEDBACK_KEYS}
+    for question_id in chunk:
+        feedback = state["questions"][question_id]["feedback"]
+        for key in FEEDBACK_KEYS:
+            combined[key].extend(feedback[key])
+    return combined
+
+
+def run_sequential(fn, items):
+    return [fn(item) for item in items]
+
+
+def summarize(state, map_fn, reduce_fn, chunk_bullets=DEFAULT_CHUNK_BULLETS,
+              reduce_fanout=DEFAULT_REDUCE_FANOUT, run_all=run_sequential):
+    """
+    Summarize all feedback in the state, reusing cached summaries.
+
+    map_fn(feedback) summarizes one chunk's {"strengths", "improvements",
+    "suggestions"} lists; reduce_fn(summaries) merges a list of summaries.
+    run_all(fn, items) applies fn to each item and may do so concurrently;
+    it is called once for the map step and once per reduce level.
+    Returns (summary, stats).
+    """
+    if not state["questions"]:
+        raise ValueError("No feedback to summarize")
+
+    assign_chunks(state, chunk_bullets)
+    cache = state["cache"]
+    used = set()
+    stats = {"chunks": len(state["chunks"]), "map_calls": 0, "reduce_calls": 0, "reused": 0}
+
+    level, pending = [], {}
+    for chunk in state["chunks"]:
+        key = "map:" + _hash([state["questions"][q]["hash"] for q in chunk])
+        if key in cache:
+            stats["reused"] += 1
+        elif key not in pending:
+            pending[key] = chunk_feedback(state, chunk)
+        used.add(key)
+        level.append(key)
+    cache.update(zip(pending, run_all(map_fn, list(pending.values()))))
+    stats["map_calls"] += len(pending)
+
+    while len(level) > 1:
+        next_level, pending = [], {}
+        for i in range(0, len(level), reduce_fanout):
+            group = level[i:i + reduce_fanout]
+            if len(group) == 1:
+                next_level.append(group[0])
+                continue
+            key = "reduce:" + _hash(group)
+            if key in cache:
+                stats["reused"] += 1
+            elif key not in pending:
+                pending[key] = [cache[k] for k in group]
+            used.add(key)
+            next_level.append(key)
+        cache.update(zip(pending, run_all(reduce_fn, list(pending.values()))))
+        stats["reduce_calls"] += len(pending)
+        level = next_level
+
+    # Drop summaries that no longer contribute to the result
+    state["cache"] = {key: cache[key] for key in used}
+    return state["cache"][level[0]], stats
+
+
+class EvaluationStore:
+    """
+    Store of per-student summarization state. Without a path, states are
+    kept in memory for the life of the process, so memory grows with the
+    number of students. With a path (SUMMARY_STORE_PATH), each student's
+    state is one JSON file in that directory, read on get() and rewritten
+    on put(); nothing is held in memory between requests.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._states = {}
+        self._lock = threading.Lock()
+        # student_id -> [lock, users]; entries are removed when unused
+        self._locks = {}
+        self._count = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._count = sum(1 for name in os.listdir(path) if name.endswith(".json"))
+
+    def _file(self, student_id):
+        return os.path.join(self.path, _hash(student_id) + ".json")
+
+    @contextmanager
+    def lock(self, student_id):
+        """Serialize concurrent updates of one student; other students are not blocked."""
+        with self._lock:
+            entry = self._locks.setdefault(student_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[student_id]
+
+    def get(self, student_id):
+        """
+        Return a copy of the student's state. Changes are only kept once
+        the caller stores the state back with put().
+        """
+        if self.path:
+            try:
+                with open(self._file(student_id)) as f:
+                    return json.load(f)["state"]
+            except FileNotFoundError:
+                return new_state()
+        with self._lock:
+            state = self._states.get(student_id)
+        return copy.deepcopy(state) if state is not None else new_state()
+
+    def put(self, student_id, state):
+        """Store a student's state. Call while holding lock(student_id)."""
+        if not self.path:
+            with self._lock:
+                self._states[student_id] = state
+            return
+        path = self._file(student_id)
+        is_new = not os.path.exists(path)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"student_id": student_id, "state": state}, f)
+        os.replace(tmp_path, path)
+        if is_new:
+            with self._lock:
+                self._count += 1
+
+    def __len__(self):
+        if self.path:
+            return self._count
+        return len(self._states)
@@ -0,0 +1,51 @@
+"""
+Image decoding for the OCR services: base64 strings or encoded bytes
+(PNG, JPEG, ...) to numpy arrays in OpenCV (BGR) format.
+"""
+import base64
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def decode_base64_image(base64_string):
+    """
+    Decode base64 string to numpy array (OpenCV format).
+    """
+    # Remove data URL prefix if present (e.g., "data:image/jpeg;base64,")
+    if ',' in base64_string:
+        base64_string = base64_string.split(',')[1]
+
+    # Decode base64 to bytes
+    image_data = base64.b64decode(base64_string)
+
+    # Decode straight to BGR, skipping the PIL -> RGB -> BGR copies. EXIF
+    # orientation is ignored, as it was with PIL
+    image_array = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8),
+                               cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image_array is not None:
+        return image_array
+
+    # Formats OpenCV cannot read (e.g. GIF): convert PIL to RGB, then BGR
+    pil_image = Image.open(io.BytesIO(image_data))
+    if pil_image.mode != 'RGB':
+        pil_image = pil_image.convert('RGB')
+    image_array = np.array(pil_image)
+    image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+
+    return image_array
+
+
+def decode_image_bytes(image_data):
+    """
+    Decode encoded image bytes (PNG, JPEG, ...) to a numpy array (OpenCV
+    format: BGR), the same way cv2.imread reads an uploaded file.
+    """
+    if len(image_data) == 0:
+        raise ValueError("Empty image data")
+    image_array = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image_array is None:
+        raise ValueError("Could not decode image data")
+    return image_array
@@ -4,14 +4,17 @@ import cv2
 import numpy as np
 import matplotlib.pyplot as plt
 import os
-import base64
-import io
-from PIL import Image
+import time
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+import metrics
+import transport
+from image_io import decode_base64_image, decode_image_bytes
 
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app, service="keras-ocr")
+transport.init_app(app)
 
 # ---------- LOAD MODEL ----------
 # pipeline = keras_ocr.pipeline.Pipeline()
@@ -25,6 +28,42 @@ recognizer.model = custom_recognizer_model
 # Create pipeline with default detector + your custom recognizer
 pipeline = keras_ocr.pipeline.Pipeline(recognizer=recognizer)
 
+# ---------- SHAPE BUCKETS ----------
+# The detector accepts any image size, so every new size makes TensorFlow
+# retrace and reallocate, and the first request at that size is slow.
+# Resized images are padded (white, bottom/right, as keras_ocr pads its own
+# batches) up to the smallest bucket that fits, so only a few shapes ever
+# reach the model, and every bucket is warmed up at startup.
+# OCR_SHAPE_BUCKETS="" disables bucketing, OCR_WARMUP=0 skips the warm-up.
+def _parse_bucket_sizes(value):
+    sizes = sorted({int(size) for size in value.split(",") if size.strip()})
+    # The largest bucket must hold any image resize_image can return
+    if sizes and sizes[-1] < pipeline.max_size:
+        sizes.append(pipeline.max_size)
+    return sizes
+
+
+OCR_SHAPE_BUCKETS = _parse_bucket_sizes(os.environ.get("OCR_SHAPE_BUCKETS", "1024,1536,2048"))
+OCR_WARMUP = os.environ.get("OCR_WARMUP", "1").lower() not in ("0", "false", "no")
+
+metrics.registry.describe("ocr_shape_bucket_total", "counter", "OCR images run, by detector input shape bucket.")
+
+
+def bucket_shape(height, width):
+    """Return the (height, width) bucket for an image, or None when bucketing is off."""
+    if not OCR_SHAPE_BUCKETS:
+        return None
+    return (next((size for size in OCR_SHAPE_BUCKETS if size >= height), height),
+            next((size for size in OCR_SHAPE_BUCKETS if size >= width), width))
+
+
+def _drop_padding_boxes(boxes, height, width):
+    """Drop boxes detected in the bucket padding (centre outside the image)."""
+    if len(boxes) == 0:
+        return boxes
+    centres = boxes.mean(axis=1)
+    return boxes[(centres[:, 0] < width) & (centres[:, 1] < height)]
+
 # ---------- PREPROCESSING ----------
 def preprocess_for_ocr(image_path=None, image_array=None):
     """
@@ -51,29 +90,38 @@ def preprocess_for_ocr(image_path=None, image_array=None):
     return rgb
 
 
-def decode_base64_image(base64_string):
+# ---------- RUN OCR ----------
+def run_ocr(image):
     """
-    Decode base64 string to numpy array (OpenCV format).
+    Run detection + recognition on a single preprocessed image.
+    Equivalent to pipeline.recognize([image])[0], split into timed stages,
+    with the detector input padded to its shape bucket.
     """
-    # Remove data URL prefix if present (e.g., "data:image/jpeg;base64,")
-    if ',' in base64_string:
-        base64_string = base64_string.split(',')[1]
+    image, scale = keras_ocr.tools.resize_image(image, max_scale=pipeline.scale, max_size=pipeline.max_size)
+    height, width = image.shape[:2]
+    detector_input = image
+
+    bucket = bucket_shape(height, width)
+    if bucket is not None:
+        # Padding on the bottom/right leaves box coordinates unchanged
+        detector_input = keras_ocr.tools.pad(image, width=bucket[1], height=bucket[0])
+        metrics.registry.inc("ocr_shape_bucket_total", bucket=f"{bucket[0]}x{bucket[1]}")
 
-    # Decode base64 to bytes
-    image_data = base64.b64decode(base64_string)
+    with metrics.stage("detection"):
+        box_groups = pipeline.detector.detect(images=np.array([detector_input]))
 
-    # Convert bytes to PIL Image
-    pil_image = Image.open(io.BytesIO(image_data))
+    boxes = box_groups[0]
+    if bucket is not None:
+        boxes = _drop_padding_boxes(boxes, height, width)
 
-    # Convert PIL to RGB if not already
-    if pil_image.mode != 'RGB':
-        pil_image = pil_image.convert('RGB')
+    # Crop words from the unpadded image, as without bucketing
+    with metrics.stage("recognition"):
+        prediction_groups = pipeline.recognizer.recognize_from_boxes(images=np.array([image]), box_groups=[boxes])
 
-    # Convert PIL to numpy array (OpenCV format: BGR)
-    image_array = np.array(pil_image)
-    image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+    if scale != 1:
+        boxes = keras_ocr.tools.adjust_boxes(boxes=boxes, boxes_format="boxes", scale=1 / scale)
 
-    return image_array
+    return list(zip(prediction_groups[0], boxes))
 
 
 # ---------- NEW ADD: SORT INTO LINES ----------
@@ -109,6 +157,49 @@ def sort_into_lines(results, y_threshold=20):
     return sorted_lines
 
 
+def extract_text(image):
+    """
+    Run OCR on a preprocessed image and return its text as a list of
+    sentences, one per detected line.
+    """
+    raw_results = run_ocr(image)
+    results = [(text, box) for text, box in raw_results]
+    with metrics.stage("sort_into_lines"):
+        lines = sort_into_lines(results)
+
+    # Extract text as sentences
+    extracted_text = []
+    for line in lines:
+        sentence = " ".join([text for text, _ in line])
+        if sentence.strip():  # Only add non-empty sentences
+            extracted_text.append(sentence)
+    return extracted_text
+
+
+# ---------- WARM-UP ----------
+def warm_up():
+    """
+    Run dummy detection for every bucket shape, and recognition once, so
+    no request pays for tracing a new input shape.
+    """
+    start = time.perf_counter()
+    for height in OCR_SHAPE_BUCKETS:
+        for width in OCR_SHAPE_BUCKETS:
+            blank = np.full((height, width, 3), 255, dtype=np.uint8)
+            with metrics.stage("warmup"):
+                pipeline.detector.detect(images=np.array([blank]))
+
+    word_box = np.array([[[0, 0], [100, 0], [100, 32], [0, 32]]], dtype="float32")
+    with metrics.stage("warmup"):
+        pipeline.recognizer.recognize_from_boxes(images=[np.full((32, 100, 3), 255, dtype=np.uint8)],
+                                                 box_groups=[word_box])
+    print(f"Warmed up {len(OCR_SHAPE_BUCKETS) ** 2} OCR input shapes in {time.perf_counter() - start:.1f}s")
+
+
+if OCR_WARMUP and OCR_SHAPE_BUCKETS:
+    warm_up()
+
+
 # ---------- IMAGE PATH ----------
 # image_path = "image_ocr/image1.jpg"  # Commented out - only used for testing
 
@@ -139,17 +230,72 @@ def health_check():
     return jsonify({"status": "healthy", "service": "keras-ocr"}), 200
 
 
+def _perform_ocr_batch():
+    """
+    OCR every image in a length-prefixed framed body (see transport.py)
+    and return one result per image, in order.
+    """
+    try:
+        with metrics.stage("decode"):
+            frames = transport.unpack_frames(request.get_data(cache=False))
+            images = [decode_image_bytes(frame) for frame in frames]
+    except Exception as e:
+        return jsonify({"error": f"Invalid framed image data: {str(e)}"}), 400
+
+    if not images:
+        return jsonify({"error": "No image provided in framed request body."}), 400
+
+    try:
+        results = []
+        for image_array in images:
+            with metrics.stage("preprocess"):
+                image = preprocess_for_ocr(image_array=image_array)
+            extracted_text = extract_text(image)
+            results.append({
+                "extracted_text": extracted_text,
+                "total_lines": len(extracted_text)
+            })
+
+        return jsonify({
+            "success": True,
+            "results": results
+        }), 200
+
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({"error": f"OCR processing failed: {str(e)}"}), 500
+
+
 @app.route('/perform_ocr', methods=['POST'])
 def extract_text_endpoint():
+    """
+    Accepts one image as a multipart file upload ('image'), JSON with a
+    base64 'image' field, or a raw binary body (application/octet-stream or
+    image/*). Several images can be sent in one application/x-ocr-frames
+    body; the response then holds a 'results' list.
+    """
     try:
         image_array = None
         temp_path = None
 
+        # Batch of length-prefixed binary images
+        if request.mimetype == transport.FRAMES_MIMETYPE:
+            return _perform_ocr_batch()
+
+        # Raw binary image body
+        if transport.is_binary_image(request.mimetype):
+            try:
+                with metrics.stage("decode"):
+                    image_array = decode_image_bytes(request.get_data(cache=False))
+            except Exception as e:
+                return jsonify({"error": f"Invalid binary image data: {str(e)}"}), 400
+
         # Check if request contains base64 image data
-        if request.is_json and 'image' in request.json:
+        elif request.is_json and 'image' in request.json:
             try:
                 base64_data = request.json['image']
-                image_array = decode_base64_image(base64_data)
+                with metrics.stage("decode"):
+                    image_array = decode_base64_image(base64_data)
             except Exception as e:
                 return jsonify({"error": f"Invalid base64 image data: {str(e)}"}), 400
 
@@ -161,32 +307,25 @@ def extract_text_endpoint():
 
             # Save uploaded file temporarily
             temp_path = f"/tmp/{file.filename}"
-            file.save(temp_path)
+            with metrics.stage("save_upload"):
+                file.save(temp_path)
 
         else:
             return jsonify({
-                "error": "No image provided. Send either a file upload or JSON with base64 image data."
+                "error": "No image provided. Send a file upload, JSON with base64 image data, or a binary image body."
             }), 400
 
         try:
             # Process the image
-            if image_array is not None:
-                # Use base64 decoded image
-                image = preprocess_for_ocr(image_array=image_array)
-            else:
-                # Use file path
-                image = preprocess_for_ocr(image_path=temp_path)
-
-            raw_results = pipeline.recognize([image])[0]
-            results = [(text, box) for text, box in raw_results]
-            lines = sort_into_lines(results)
+            with metrics.stage("preprocess"):
+                if image_array is not None:
+                    # Use base64 decoded image
+                    image = preprocess_for_ocr(image_array=image_array)
+                else:
+                    # Use file path
+                    image = preprocess_for_ocr(image_path=temp_path)
 
-            # Extract text as sentences
-            extracted_text = []
-            for line in lines:
-                sentence = " ".join([text for text, _ in line])
-                if sentence.strip():  # Only add non-empty sentences
-                    extracted_text.append(sentence)
+            extracted_text = extract_text(image)
 
             # Clean up temporary file if it was created
             if temp_path and os.path.exists(temp_path):
@@ -202,9 +341,11 @@ def extract_text_endpoint():
             # Clean up temporary file in case of error
             if temp_path and os.path.exists(temp_path):
                 os.remove(temp_path)
+            metrics.record_error(e)
             return jsonify({"error": f"OCR processing failed: {str(e)}"}), 500
 
     except Exception as e:
+        metrics.record_error(e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -0,0 +1,386 @@
+"""
+Lightweight instrumentation shared by the Flask services.
+
+Records per-stage timing spans, HTTP request counts/latencies, LLM token
+usage and in-process gauges, and exposes them on a /metrics endpoint in the
+Prometheus text exposition format. Optionally emits one structured JSON log
+line per request (set METRICS_REQUEST_LOG=1).
+
+Usage:
+    import metrics
+    metrics.init_app(app, service="llm")
+
+    with metrics.stage("preprocess"):
+        image = preprocess_for_ocr(image_array=image_array)
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, copy_current_request_context, current_app, g, has_request_context, request
+
+# Histogram buckets in seconds, from fast in-process stages up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("metrics")
+
+
+class Registry:
+    """
+    Thread-safe store of counters, gauges and histograms keyed by
+    metric name and label set.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def describe(self, name, metric_type, help_text):
+        self._types[name] = metric_type
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def add_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._histograms[key] = hist
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist["counts"][i] += 1
+                    break
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def get(self, name, **labels):
+        """Return the current value of a counter or gauge (0 if unset)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            return self._gauges.get(key, 0)
+
+    def total(self, name, **labels):
+        """Sum a counter or gauge across all label sets matching `labels`."""
+        wanted = set(labels.items())
+        with self._lock:
+            values = list(self._counters.items()) + list(self._gauges.items())
+        return sum(v for (n, key_labels), v in values if n == name and wanted <= set(key_labels))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {k: {"counts": list(v["counts"]), "sum": v["sum"], "count": v["count"]}
+                          for k, v in self._histograms.items()}
+
+        lines = []
+        emitted = set()
+
+        def header(name, default_type):
+            if name in emitted:
+                return
+            emitted.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {self._types.get(name, default_type)}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), hist in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets, hist["counts"]):
+                cumulative += count
+                bucket_labels = labels + (("le", _format_value(bound)),)
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            inf_labels = labels + (("le", "+Inf"),)
+            lines.append(f"{name}_bucket{_format_labels(inf_labels)} {hist['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(hist['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# Process-wide registry shared by every app in the process
+registry = Registry()
+
+registry.describe("http_requests_total", "counter", "HTTP requests handled, by endpoint and status code.")
+registry.describe("http_request_duration_seconds", "histogram", "End-to-end HTTP request latency.")
+registry.describe("http_requests_in_flight", "gauge", "HTTP requests currently being processed.")
+registry.describe("stage_duration_seconds", "histogram", "Latency of individual processing stages within a request.")
+registry.describe("errors_total", "counter", "Exceptions caught by request handlers, by exception type.")
+registry.describe("llm_requests_total", "counter", "LLM API calls, by endpoint and model.")
+registry.describe("llm_prompt_tokens_total", "counter", "Prompt tokens reported by the LLM API.")
+registry.describe("llm_completion_tokens_total", "counter", "Completion tokens reported by the LLM API.")
+registry.describe("llm_prompt_tokens_estimated_total", "counter", "Prompt tokens estimated locally before each call.")
+registry.describe("llm_prompt_tokens_estimate_abs_error_total", "counter",
+                  "Absolute difference between estimated and reported prompt tokens.")
+registry.describe("llm_max_tokens_reserved_total", "counter", "max_tokens reserved across LLM calls.")
+registry.describe("llm_truncated_total", "counter", "LLM responses cut off by max_tokens (finish_reason=length).")
+
+
+def _service():
+    if has_request_context():
+        return current_app.extensions.get("metrics_service", current_app.name)
+    return "none"
+
+
+def _endpoint():
+    if has_request_context():
+        return request.url_rule.rule if request.url_rule else "unmatched"
+    return "none"
+
+
+_stages_lock = threading.Lock()
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a processing stage. The duration is recorded in the
+    stage_duration_seconds histogram and in the per-request log record.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("stage_duration_seconds", elapsed,
+                         service=_service(), endpoint=_endpoint(), stage=name)
+        if has_request_context() and hasattr(g, "metrics_stages"):
+            # The dict is shared with worker threads through propagate()
+            with _stages_lock:
+                g.metrics_stages[name] = g.metrics_stages.get(name, 0.0) + elapsed
+
+
+def propagate(fn):
+    """
+    Wrap fn so it can run in a worker thread with a copy of the current
+    request context, still recording into this request's log record.
+    Call once per task, from the request thread.
+    """
+    if not has_request_context():
+        return fn
+    stages, llm = g.get("metrics_stages"), g.get("metrics_llm")
+
+    def run(*args, **kwargs):
+        if stages is not None:
+            g.metrics_stages, g.metrics_llm = stages, llm
+        return fn(*args, **kwargs)
+
+    return copy_current_request_context(run)
+
+
+def record_llm_usage(model, usage, estimated_prompt_tokens=None, max_tokens=None, finish_reason=None):
+    """
+    Record one LLM call and the token usage reported in the API response.
+    `usage` is the response's usage object (may be None). When the local
+    prompt-token estimate is given, its error against the reported usage is
+    recorded too.
+    """
+    service, endpoint = _service(), _endpoint()
+    labels = {"service": service, "endpoint": endpoint, "model": model}
+    registry.inc("llm_requests_total", **labels)
+
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    registry.inc("llm_prompt_tokens_total", prompt_tokens, **labels)
+    registry.inc("llm_completion_tokens_total", completion_tokens, **labels)
+
+    if estimated_prompt_tokens is not None:
+        registry.inc("llm_prompt_tokens_estimated_total", estimated_prompt_tokens, **labels)
+        if usage is not None:
+            registry.inc("llm_prompt_tokens_estimate_abs_error_total",
+                         abs(estimated_prompt_tokens - prompt_tokens), **labels)
+    if max_tokens is not None:
+        registry.inc("llm_max_tokens_reserved_total", max_tokens, **labels)
+    if finish_reason == "length":
+        registry.inc("llm_truncated_total", **labels)
+
+    if has_request_context() and hasattr(g, "metrics_llm"):
+        record = {
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens
+        }
+        if estimated_prompt_tokens is not None:
+            record["prompt_tokens_estimated"] = estimated_prompt_tokens
+        if max_tokens is not None:
+            record["max_tokens"] = max_tokens
+        g.metrics_llm.append(record)
+
+
+def record_error(exc):
+    """
+    Count an exception caught by a request handler and log its traceback,
+    so errors returned as a generic 500 are still diagnosable.
+    """
+    registry.inc("errors_total", service=_service(), endpoint=_endpoint(), type=type(exc).__name__)
+    logger.error("Unhandled error in %s", _endpoint(), exc_info=exc)
+
+
+def _request_log_enabled():
+    return os.environ.get("METRICS_REQUEST_LOG", "").lower() in ("1", "true", "yes")
+
+
+def init_app(app, service):
+    """
+    Install request hooks and the /metrics endpoint on a Flask app.
+    """
+    app.extensions["metrics_service"] = service
+    request_log = _request_log_enabled()
+    if request_log and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+    @app.before_request
+    def _metrics_before_request():
+        g.metrics_start = time.perf_counter()
+        g.metrics_stages = {}
+        g.metrics_llm = []
+        registry.add_gauge("http_requests_in_flight", 1, service=service)
+
+    @app.after_request
+    def _metrics_after_request(response):
+        start = g.get("metrics_start")
+        if start is None or request.path == "/metrics":
+            return response
+
+        endpoint, method, status = _endpoint(), request.method, response.status_code
+        stages, llm = g.metrics_stages, g.metrics_llm
+
+        def record():
+            elapsed = time.perf_counter() - start
+            registry.inc("http_requests_total", service=service, endpoint=endpoint,
+                         method=method, status=str(status))
+            registry.observe("http_request_duration_seconds", elapsed, service=service, endpoint=endpoint)
+
+            if request_log:
+                with _stages_lock:
+                    stages_ms = {k: round(v * 1000, 3) for k, v in stages.items()}
+                logger.info(json.dumps({
+                    "service": service,
+                    "endpoint": endpoint,
+                    "method": method,
+                    "status": status,
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "stages_ms": stages_ms,
+                    "llm": llm
+                }))
+
+        if response.is_streamed:
+            # The body is generated after this hook: time the request when the stream closes
+            response.call_on_close(record)
+        else:
+            record()
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown_request(exc):
+        if g.pop("metrics_start", None) is not None:
+            registry.add_gauge("http_requests_in_flight", -1, service=service)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    return app
+
+
+if __name__ == '__main__':
+    # Measure instrumentation overhead: a bare span, and a full request through
+    # the Flask test client with and without the hooks installed.
+    from flask import Flask
+
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        with stage("bench"):
+            pass
+    span_us = (time.perf_counter() - start) / n * 1e6
+
+    def make_app(instrumented):
+        bench_app = Flask(f"bench_{instrumented}")
+
+        @bench_app.route('/ping')
+        def ping():
+            with stage("noop"):
+                pass
+            return "ok"
+
+        if instrumented:
+            init_app(bench_app, service="bench")
+        return bench_app
+
+    request_us = {}
+    for instrumented in (False, True):
+        client = make_app(instrumented).test_client()
+        for _ in range(200):
+            client.get('/ping')
+        start = time.perf_counter()
+        for _ in range(2000):
+            client.get('/ping')
+        request_us[instrumented] = (time.perf_counter() - start) / 2000 * 1e6
+
+    print(json.dumps({
+        "span_overhead_us": round(span_us, 2),
+        "request_us_without_metrics": round(request_us[False], 2),
+        "request_us_with_metrics": round(request_us[True], 2),
+        "request_overhead_us": round(request_us[True] - request_us[False], 2)
+    }, indent=2))
@@ -0,0 +1,203 @@
+"""
+Model cascade for the LLM endpoints: answer with a small, fast model first
+and escalate to the large model only when the small model's output looks
+uncertain.
+
+Each endpoint has a policy:
+    strategy          "cascade", "large" (large model only) or "small"
+    small_model       model tried first
+    large_model       model used on escalation
+    borderline        [low, high] score band that is always escalated (grading)
+    min_confidence    escalate when the self-reported confidence is lower (grading)
+    second_sample     also draw a second small-model sample and escalate on disagreement
+    max_score_diff    largest score difference counted as agreement (grading)
+    min_similarity    smallest text similarity counted as agreement (text outputs)
+    max_length_ratio  escalate text outputs this many times longer/shorter than the input
+
+Defaults can be overridden with LLM_ROUTING_POLICY, either inline JSON or
+a path to a JSON file, keyed by endpoint:
+    LLM_ROUTING_POLICY='{"grade": {"borderline": [45, 65]}, "correct": {"strategy": "large"}}'
+"""
+import copy
+import difflib
+import json
+import os
+
+import metrics
+import token_budget
+
+SMALL_MODEL = os.environ.get("LLM_SMALL_MODEL", "llama-3.1-8b-instant")
+LARGE_MODEL = os.environ.get("LLM_LARGE_MODEL", "llama-3.3-70b-versatile")
+
+DEFAULT_POLICY = {
+    "strategy": "large",
+    "small_model": SMALL_MODEL,
+    "large_model": LARGE_MODEL,
+    "second_sample": False
+}
+
+DEFAULT_POLICIES = {
+    "grade": {
+        "strategy": "cascade",
+        "borderline": [40, 60],
+        "min_confidence": 0.7,
+        "max_score_diff": 10
+    },
+    "correct": {
+        "strategy": "cascade",
+        "max_length_ratio": 4.0,
+        "min_similarity": 0.8
+    },
+    "adjust_ocr": {
+        "strategy": "large",
+        "max_length_ratio": 1.5,
+        "min_similarity": 0.9
+    },
+    "student_evaluate": {
+        "strategy": "large"
+    }
+}
+
+# Instruction added to the small model's system prompt for grading
+CONFIDENCE_INSTRUCTION = (
+    ' Also include a "confidence" field in the JSON: a number from 0 to 1 '
+    'saying how sure you are that the score is right.'
+)
+
+metrics.registry.describe("llm_route_total", "counter",
+                          "Routed LLM requests, by final model and escalation reason.")
+
+
+def _load_overrides():
+    value = os.environ.get("LLM_ROUTING_POLICY", "").strip()
+    if not value:
+        return {}
+    if not value.startswith("{"):
+        with open(value) as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+_overrides = _load_overrides()
+
+
+def get_policy(endpoint):
+    """Return the effective routing policy for an endpoint."""
+    policy = dict(DEFAULT_POLICY)
+    policy.update(copy.deepcopy(DEFAULT_POLICIES.get(endpoint, {})))
+    policy.update(_overrides.get(endpoint, {}))
+    if policy["strategy"] not in ("cascade", "large", "small"):
+        raise ValueError(f"Unknown routing strategy for {endpoint}: {policy['strategy']}")
+    return policy
+
+
+def set_policies(overrides):
+    """Replace the policy overrides (used by benchmarks)."""
+    global _overrides
+    _overrides = copy.deepcopy(overrides)
+
+
+# ---------- CONFIDENCE CHECKS ----------
+def check_grade(result, policy):
+    """Return why a grading result is uncertain, or None if it can be trusted."""
+    score = result.get("score")
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 100:
+        return "invalid_score"
+    if not result.get("corrected_answer"):
+        return "missing_fields"
+
+    borderline = policy.get("borderline")
+    if borderline and borderline[0] <= score <= borderline[1]:
+        return "borderline"
+
+    min_confidence = policy.get("min_confidence")
+    if min_confidence is not None:
+        confidence = result.get("confidence")
+        if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+            return "no_confidence"
+        if confidence < min_confidence:
+            return "low_confidence"
+    return None
+
+
+def grades_agree(first, second, policy):
+    if check_grade(second, dict(policy, borderline=None, min_confidence=None)) is not None:
+        return False
+    return abs(first["score"] - second["score"]) <= policy.get("max_score_diff", 10)
+
+
+def check_text(output, source, policy):
+    """Return why a text output is uncertain, or None. Short inputs may grow."""
+    if not output or not output.strip():
+        return "empty_output"
+    max_ratio = policy.get("max_length_ratio")
+    if max_ratio:
+        ratio = len(output) / max(len(source), 40)
+        if ratio > max_ratio or len(output) < len(source) / max_ratio:
+            return "length_ratio"
+    return None
+
+
+def texts_agree(first, second, policy):
+    similarity = difflib.SequenceMatcher(None, first, second).ratio()
+    return similarity >= policy.get("min_similarity", 0.8)
+
+
+def check_summary(result, policy):
+    keys = ("overall_strengths", "overall_improvements", "overall_suggestions")
+    if not all(isinstance(result.get(key), str) and result.get(key).strip() for key in keys):
+        return "missing_fields"
+    return None
+
+
+# ---------- ROUTING ----------
+def route(endpoint, attempt, check, agree=None):
+    """
+    Run one request through the endpoint's routing policy.
+
+    attempt(model, sample, small) calls the model and returns the parsed
+    result; `sample` is 0 for the first draw and 1 for the agreement sample,
+    `small` is True for small-model attempts. It may raise ValueError (or
+    KeyError/TypeError) for unusable output. check(result, policy) returns an
+    escalation reason or None; agree(first, second, policy) compares two
+    small-model samples.
+
+    Returns (result, info) with info = {"model", "escalated", "reason"}.
+    """
+    policy = get_policy(endpoint)
+    strategy = policy["strategy"]
+
+    if strategy != "cascade":
+        model = policy["small_model"] if strategy == "small" else policy["large_model"]
+        result = attempt(model, 0, strategy == "small")
+        return result, _record(endpoint, strategy, model, False, None)
+
+    small_model = policy["small_model"]
+    try:
+        with metrics.stage("route_small"):
+            result = attempt(small_model, 0, True)
+            reason = check(result, policy)
+            if reason is None and policy.get("second_sample") and agree is not None:
+                second = attempt(small_model, 1, True)
+                if not agree(result, second, policy):
+                    reason = "samples_disagree"
+    except token_budget.RequestTooLarge:
+        raise
+    except (ValueError, KeyError, TypeError):
+        reason = "invalid_output"
+    except Exception:
+        # Small model unavailable (rate limited, API error): use the large one
+        reason = "small_model_error"
+
+    if reason is None:
+        return result, _record(endpoint, strategy, small_model, False, None)
+
+    large_model = policy["large_model"]
+    result = attempt(large_model, 0, False)
+    return result, _record(endpoint, strategy, large_model, True, reason)
+
+
+def _record(endpoint, strategy, model, escalated, reason):
+    metrics.registry.inc("llm_route_total", route=endpoint, strategy=strategy, model=model,
+                         escalated=str(escalated).lower(), reason=reason or "none")
+    return {"model": model, "escalated": escalated, "reason": reason}
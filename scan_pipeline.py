@@ -0,0 +1,264 @@
+"""
+Single-call scan-to-grade service: OCR -> OCR correction -> grading.
+
+Runs the keras-ocr model and the Groq calls in one process instead of
+chaining /perform_ocr, /adjust_ocr and /grade over HTTP. Pages are OCRed
+one at a time on a background thread; as soon as a question's answer is
+complete it is corrected and graded on a thread pool, while later pages
+are still being OCRed. Results are streamed back as newline-delimited JSON
+events.
+
+The text of all pages is split into answers on question markers at the
+start of a line ("Q3:", "Question 3.", and with bare_numbers also "3.",
+"3)"; see answer_segmenter.py). With page_per_question, page i is taken
+as the answer to question i instead.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask_cors import CORS
+
+import metrics
+import transport
+import kerasOCR
+import LLM_main
+import token_budget
+from answer_segmenter import AnswerSegmenter
+
+app = Flask(__name__)
+CORS(app)
+metrics.init_app(app, service="scan-pipeline")
+transport.init_app(app)
+
+# Concurrent correction + grading tasks per sheet
+PIPELINE_MAX_WORKERS = int(os.environ.get("PIPELINE_MAX_WORKERS", 4))
+
+# The OCR model is shared by all requests; run one page at a time
+_ocr_lock = threading.Lock()
+
+def ocr_page(image_array):
+    """OCR one decoded page and return its lines of text."""
+    with _ocr_lock:
+        with metrics.stage("preprocess"):
+            image = kerasOCR.preprocess_for_ocr(image_array=image_array)
+        return kerasOCR.extract_text(image)
+
+
+def grade_question(client, index, question, ocr_text, context, cancel=None):
+    """Correct the OCR text of one answer and grade it."""
+    if cancel is not None and cancel.is_set():
+        return {"event": "error", "question_index": index, "error": "Cancelled"}
+    if not ocr_text.strip():
+        return {"event": "error", "question_index": index, "error": "No answer text found for this question"}
+    try:
+        with metrics.stage("correct"):
+            corrected_text = LLM_main.correct_ocr_text(client, ocr_text, context)
+        with metrics.stage("grade"):
+            result = LLM_main.grade_student_answer(
+                client, question.get("question", ""), corrected_text, question.get("rubric", "")
+            )
+        return {
+            "event": "grade",
+            "question_index": index,
+            "question": question.get("question", ""),
+            "ocr_text": ocr_text,
+            "corrected_text": corrected_text,
+            **result
+        }
+    except Exception as e:
+        if not isinstance(e, token_budget.RequestTooLarge):
+            metrics.record_error(e)
+        return {"event": "error", "question_index": index, "error": str(e)}
+
+
+def run_pipeline(pages, questions, context, events, bare_numbers=False, page_per_question=False, cancel=None):
+    """
+    OCR `pages` (decoded images) in order and grade every question,
+    putting event dicts on the `events` queue; None marks the end.
+    Setting the `cancel` event skips the remaining pages and questions.
+    """
+    cancel = cancel or threading.Event()
+    start = time.perf_counter()
+    client = LLM_main.get_groq_client()
+    segmenter = AnswerSegmenter(len(questions), bare_numbers=bare_numbers)
+
+    with ThreadPoolExecutor(max_workers=PIPELINE_MAX_WORKERS) as pool:
+        def submit(index, ocr_text):
+            if cancel.is_set():
+                return
+            task = metrics.propagate(grade_question)
+            future = pool.submit(task, client, index, questions[index], ocr_text, context, cancel)
+            future.add_done_callback(lambda done: events.put(done.result()))
+
+        for page_index, image_array in enumerate(pages):
+            if cancel.is_set():
+                break
+            try:
+                lines = ocr_page(image_array)
+            except Exception as e:
+                metrics.record_error(e)
+                events.put({"event": "error", "page": page_index, "error": f"OCR processing failed: {str(e)}"})
+                lines = []
+            else:
+                events.put({"event": "page", "page": page_index, "extracted_text": lines})
+
+            if page_per_question:
+                submit(page_index, "\n".join(lines))
+            else:
+                for index in segmenter.feed(lines):
+                    submit(index, segmenter.answer(index))
+
+        if not page_per_question:
+            for index in segmenter.finish():
+                submit(index, segmenter.answer(index))
+
+    events.put({
+        "event": "done",
+        "total_pages": len(pages),
+        "total_questions": len(questions),
+        "cancelled": cancel.is_set(),
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+    })
+    events.put(None)
+
+
+def _decode_page(decode, data):
+    try:
+        with metrics.stage("decode"):
+            return decode(data)
+    except Exception as e:
+        raise ValueError(f"Invalid page image data: {str(e)}")
+
+
+def _parse_request():
+    """
+    Read pages and questions from either a multipart upload ('pages' files,
+    'questions' JSON string field) or a JSON body ('pages' base64 strings).
+    Returns (pages, questions, context, stream, bare_numbers, page_per_question)
+    or raises ValueError.
+    """
+    if request.is_json:
+        data = request.json or {}
+        pages = [_decode_page(kerasOCR.decode_base64_image, page) for page in data.get('pages', [])]
+        questions = data.get('questions', [])
+        context = data.get('context', '')
+        stream = data.get('stream', True)
+        bare_numbers = bool(data.get('bare_numbers', False))
+        page_per_question = bool(data.get('page_per_question', False))
+    else:
+        pages = [_decode_page(kerasOCR.decode_image_bytes, file.read()) for file in request.files.getlist('pages')]
+        questions = json.loads(request.form.get('questions', '[]'))
+        context = request.form.get('context', '')
+        stream = request.form.get('stream', 'true').lower() != 'false'
+        bare_numbers = request.form.get('bare_numbers', 'false').lower() == 'true'
+        page_per_question = request.form.get('page_per_question', 'false').lower() == 'true'
+
+    questions = [{"question": q} if isinstance(q, str) else q for q in questions]
+    if not pages:
+        raise ValueError("At least one page image is required")
+    if not questions or not all(q.get("question") for q in questions):
+        raise ValueError("questions must be a non-empty list of questions")
+    if page_per_question and len(pages) != len(questions):
+        raise ValueError("page_per_question needs one page per question")
+    return pages, questions, context, stream, bare_numbers, page_per_question
+
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({"status": "healthy", "service": "scan-pipeline"}), 200
+
+
+@app.route('/scan_grade', methods=['POST'])
+def scan_grade():
+    """
+    OCR a scanned answer sheet, correct the OCR text and grade each answer.
+    Expected body, either multipart/form-data:
+        pages: one or more image files, in page order
+        questions: '[{"question": "...", "rubric": "..."}, ...]'
+        context: optional OCR context
+        stream: 'false' to get one JSON response instead of a stream
+        bare_numbers: 'true' to also split answers on lines starting "2.", "3)"
+        page_per_question: 'true' if page i holds the answer to question i
+    or JSON:
+    {
+        "pages": ["<base64 image>", ...],
+        "questions": [{"question": "What is photosynthesis?", "rubric": "optional"}],
+        "context": "optional",
+        "stream": true,
+        "bare_numbers": false,
+        "page_per_question": false
+    }
+
+    Streams newline-delimited JSON events as they complete:
+        {"event": "page", "page": 0, "extracted_text": [...]}
+        {"event": "grade", "question_index": 0, "score": 80, "corrected_text": ..., ...}
+        {"event": "error", "question_index": 1, "error": "..."}
+        {"event": "done", "total_pages": 2, "total_questions": 3, "duration_ms": ...}
+    """
+    try:
+        try:
+            pages, questions, context, stream, bare_numbers, page_per_question = _parse_request()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        events = queue.Queue()
+        cancel = threading.Event()
+        metrics.registry.add_gauge("pipeline_sheets_in_progress", 1, service="scan-pipeline")
+
+        def pipeline():
+            try:
+                run_pipeline(pages, questions, context, events, bare_numbers, page_per_question, cancel)
+            except Exception as e:
+                metrics.record_error(e)
+                events.put({"event": "error", "error": str(e)})
+                events.put(None)
+            finally:
+                metrics.registry.add_gauge("pipeline_sheets_in_progress", -1, service="scan-pipeline")
+
+        threading.Thread(target=metrics.propagate(pipeline), daemon=True).start()
+
+        def iter_events():
+            try:
+                while True:
+                    event = events.get()
+                    if event is None:
+                        return
+                    yield event
+            finally:
+                # Done, or the client disconnected mid-stream: stop the remaining work
+                cancel.set()
+
+        if stream:
+            def ndjson():
+                with closing(iter_events()) as stream_events:
+                    for event in stream_events:
+                        yield json.dumps(event) + "\n"
+
+            return Response(stream_with_context(ndjson()), mimetype="application/x-ndjson")
+
+        collected = list(iter_events())
+        results = sorted((e for e in collected if e["event"] in ("grade", "error") and "question_index" in e),
+                         key=lambda e: e["question_index"])
+        return jsonify({
+            "success": True,
+            "pages": [e for e in collected if e["event"] == "page"],
+            "results": results,
+            "errors": [e for e in collected if e["event"] == "error" and "question_index" not in e],
+            "duration_ms": next((e["duration_ms"] for e in collected if e["event"] == "done"), None)
+        }), 200
+
+    except Exception as e:
+        metrics.record_error(e)
+        return jsonify({"error": str(e)}), 500
+
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5003))
+    print(f"Starting scan-to-grade pipeline API on port {port}")
+    app.run(host='0.0.0.0', port=port, debug=True, threaded=True)
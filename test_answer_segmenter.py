@@ -0,0 +1,64 @@
+from answer_segmenter import AnswerSegmenter
+
+
+def segment(pages, question_count, **kwargs):
+    segmenter = AnswerSegmenter(question_count, **kwargs)
+    completed = []
+    for lines in pages:
+        completed.extend(segmenter.feed(lines))
+    completed.extend(segmenter.finish())
+    return completed, [segmenter.answer(i) for i in range(question_count)]
+
+
+def test_prefixed_markers_split_answers():
+    _, answers = segment([["Q1. Plants make food", "using light"], ["Question 2: Four"]], 2)
+    assert answers == ["Plants make food\nusing light", "Four"]
+
+
+def test_numbered_points_stay_in_the_current_answer():
+    _, answers = segment([["Q1. Three reasons:", "1. a", "2. b", "3. c", "Q2) done"]], 3)
+    assert answers == ["Three reasons:\n1. a\n2. b\n3. c", "done", ""]
+
+
+def test_prefixed_markers_may_skip_questions_but_not_go_back():
+    _, answers = segment([["Q1 first", "Q3 third", "Q2 not a new answer"]], 3)
+    assert answers == ["first", "", "third\nQ2 not a new answer"]
+
+
+def test_bare_numbers_only_start_the_next_question():
+    _, answers = segment([["1. first", "3. a point", "2. second"]], 3, bare_numbers=True)
+    assert answers == ["first\n3. a point", "second", ""]
+
+
+def test_text_before_the_first_marker_is_dropped():
+    _, answers = segment([["Name: Alice", "Q2 answer"]], 2)
+    assert answers == ["", "answer"]
+
+
+def test_header_line_before_question_one():
+    _, answers = segment([["Name: John Smith", "Q1: photosynthesis is x", "Q2: four"]], 2)
+    assert answers == ["photosynthesis is x", "four"]
+
+
+def test_header_line_before_bare_number_one():
+    _, answers = segment([["Class 3B", "1. first", "2. second"]], 2, bare_numbers=True)
+    assert answers == ["first", "second"]
+
+
+def test_answers_complete_when_a_later_marker_is_seen():
+    segmenter = AnswerSegmenter(3)
+    assert segmenter.feed(["Q1 a"]) == []
+    assert segmenter.feed(["more", "Q2 b"]) == [0]
+    assert segmenter.feed(["Q3 c"]) == [1]
+    assert segmenter.finish() == [2]
+
+
+def test_no_markers_with_several_questions_gives_no_answers():
+    completed, answers = segment([["some text", "more text"]], 2)
+    assert completed == [0, 1]
+    assert answers == ["", ""]
+
+
+def test_single_question_takes_all_text():
+    _, answers = segment([["some text"], ["more text"]], 1)
+    assert answers == ["some text\nmore text"]
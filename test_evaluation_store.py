@@ -0,0 +1,175 @@
+import threading
+
+import pytest
+
+import evaluation_store
+import token_budget
+from evaluation_store import EvaluationStore, assign_chunks, merge_feedback, new_state, pack_feedback, summarize
+
+
+def feedback(name, bullets=1):
+    return {
+        "strengths": [f"{name} strength {i}" for i in range(bullets)],
+        "improvements": [f"{name} improvement"],
+        "suggestions": []
+    }
+
+
+def fake_map(chunk):
+    return {"overall_strengths": "|".join(chunk["strengths"]), "overall_improvements": "", "overall_suggestions": ""}
+
+
+def fake_reduce(summaries):
+    return {"overall_strengths": "+".join(s["overall_strengths"] for s in summaries),
+            "overall_improvements": "", "overall_suggestions": ""}
+
+
+def test_merge_feedback_counts_changes_and_removals():
+    state = new_state()
+    assert merge_feedback(state, {"q1": feedback("a"), "q2": feedback("b")}) == 2
+    assert merge_feedback(state, {"q1": feedback("a")}) == 0
+    assert merge_feedback(state, {"q1": feedback("c"), "q2": None}) == 2
+    assert list(state["questions"]) == ["q1"]
+    assert merge_feedback(state, {"q3": feedback("d")}, replace=True) == 2
+    assert list(state["questions"]) == ["q3"]
+
+
+@pytest.mark.parametrize("bad", [
+    ["x"],
+    "text",
+    {"strengths": "good"},
+    {"strengths": [1, 2]},
+])
+def test_merge_feedback_rejects_malformed_feedback_without_changes(bad):
+    state = new_state()
+    merge_feedback(state, {"q1": feedback("a")})
+    with pytest.raises(ValueError):
+        merge_feedback(state, {"q1": None, "q2": bad})
+    assert list(state["questions"]) == ["q1"]
+
+
+def part_tokens(part):
+    return sum(token_budget.count_tokens(b) + 1 for key in evaluation_store.FEEDBACK_KEYS for b in part[key])
+
+
+def test_pack_feedback_fits_skewed_bullet_lengths():
+    short = [f"Good point {i}." for i in range(200)]
+    long = [" ".join(f"detailed{j} explanation" for j in range(120)) for _ in range(10)]
+    flat = {"strengths": short + long, "improvements": ["x"], "suggestions": []}
+
+    parts = pack_feedback(flat, 1000, token_budget.count_tokens)
+    assert len(parts) > 1
+    assert all(part_tokens(part) <= 1000 for part in parts.values())
+    # Every bullet is kept, in order
+    for key in evaluation_store.FEEDBACK_KEYS:
+        assert [b for part in parts.values() for b in part[key]] == flat[key]
+
+
+def test_pack_feedback_gives_an_oversized_bullet_its_own_part():
+    parts = pack_feedback({"strengths": ["a", "word " * 50, "b"]}, 10, token_budget.count_tokens)
+    assert [part["strengths"] for part in parts.values()] == [["a"], ["word " * 50], ["b"]]
+
+
+def test_packed_parts_are_summarized_one_per_chunk():
+    flat = {"strengths": [f"bullet {i}" for i in range(30)], "improvements": [], "suggestions": []}
+    state = new_state()
+    merge_feedback(state, pack_feedback(flat, 20, token_budget.count_tokens))
+    _, stats = summarize(state, fake_map, fake_reduce, chunk_bullets=1)
+    assert stats["chunks"] == stats["map_calls"] == len(state["questions"])
+
+
+def test_assign_chunks_keeps_existing_groups_when_questions_are_added():
+    state = new_state()
+    merge_feedback(state, {f"q{i}": feedback(f"q{i}") for i in range(4)})
+    assert assign_chunks(state, chunk_bullets=4) == [["q0", "q1"], ["q2", "q3"]]
+
+    merge_feedback(state, {"q4": feedback("q4")})
+    assert assign_chunks(state, chunk_bullets=4) == [["q0", "q1"], ["q2", "q3"], ["q4"]]
+
+
+def test_assign_chunks_splits_chunks_that_grew_over_the_limit():
+    state = new_state()
+    merge_feedback(state, {"q0": feedback("q0"), "q1": feedback("q1")})
+    assign_chunks(state, chunk_bullets=4)
+    merge_feedback(state, {"q0": feedback("q0", bullets=3)})
+    assert assign_chunks(state, chunk_bullets=4) == [["q0"], ["q1"]]
+
+
+def test_summarize_only_recomputes_changed_chunks():
+    state = new_state()
+    merge_feedback(state, {f"q{i}": feedback(f"q{i}") for i in range(6)})
+    summary, stats = summarize(state, fake_map, fake_reduce, chunk_bullets=4, reduce_fanout=8)
+    assert stats == {"chunks": 3, "map_calls": 3, "reduce_calls": 1, "reused": 0}
+    assert summary["overall_strengths"].count("+") == 2
+
+    _, stats = summarize(state, fake_map, fake_reduce, chunk_bullets=4, reduce_fanout=8)
+    assert stats["map_calls"] == 0 and stats["reduce_calls"] == 0
+
+    merge_feedback(state, {"q3": feedback("changed")})
+    summary, stats = summarize(state, fake_map, fake_reduce, chunk_bullets=4, reduce_fanout=8)
+    assert stats == {"chunks": 3, "map_calls": 1, "reduce_calls": 1, "reused": 2}
+    assert "changed strength 0" in summary["overall_strengths"]
+    # Summaries that no longer contribute are dropped from the cache
+    assert len(state["cache"]) == 4
+
+
+def test_summarize_single_chunk_needs_no_reduce():
+    state = new_state()
+    merge_feedback(state, {"q1": feedback("a")})
+    summary, stats = summarize(state, fake_map, fake_reduce)
+    assert summary["overall_strengths"] == "a strength 0"
+    assert stats["reduce_calls"] == 0
+
+
+def test_summarize_rejects_empty_state():
+    with pytest.raises(ValueError):
+        summarize(new_state(), fake_map, fake_reduce)
+
+
+def test_store_get_returns_a_copy():
+    store = EvaluationStore()
+    state = store.get("s1")
+    merge_feedback(state, {"q1": feedback("a")})
+    store.put("s1", state)
+
+    copy = store.get("s1")
+    merge_feedback(copy, {"q1": None})
+    assert list(store.get("s1")["questions"]) == ["q1"]
+
+
+def test_store_persists_one_file_per_student(tmp_path):
+    store = EvaluationStore(str(tmp_path))
+    for student_id in ("s1", "../s2"):
+        with store.lock(student_id):
+            state = store.get(student_id)
+            merge_feedback(state, {"q1": feedback(student_id)})
+            store.put(student_id, state)
+    assert len(list(tmp_path.glob("*.json"))) == 2
+    store.put("s1", store.get("s1"))
+    assert len(store) == 2
+
+    reloaded = EvaluationStore(str(tmp_path))
+    assert len(reloaded) == 2
+    assert reloaded.get("../s2")["questions"]["q1"]["feedback"] == feedback("../s2")
+
+
+def test_store_lock_is_per_student_and_released():
+    store = EvaluationStore()
+    with store.lock("s1"):
+        # Another student is not blocked while s1 is being updated
+        with store.lock("s2"):
+            pass
+        assert list(store._locks) == ["s1"]
+
+        entered = threading.Event()
+
+        def same_student():
+            with store.lock("s1"):
+                entered.set()
+
+        waiter = threading.Thread(target=same_student)
+        waiter.start()
+        assert not entered.wait(0.1)
+    waiter.join(1)
+    assert entered.is_set()
+    assert store._locks == {}
@@ -0,0 +1,134 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask, Response, g, jsonify
+
+import metrics
+from metrics import Registry, registry
+
+
+def test_render_groups_families_with_one_header():
+    reg = Registry()
+    reg.describe("jobs_total", "counter", "Jobs run.")
+    reg.inc("jobs_total", kind="b")
+    reg.set_gauge("queue_depth", 3)
+    reg.inc("jobs_total", 2, kind="a")
+
+    lines = reg.render().splitlines()
+    assert lines == [
+        "# HELP jobs_total Jobs run.",
+        "# TYPE jobs_total counter",
+        'jobs_total{kind="a"} 2',
+        'jobs_total{kind="b"} 1',
+        "# TYPE queue_depth gauge",
+        "queue_depth 3",
+    ]
+
+
+def test_render_histogram_buckets_are_cumulative():
+    reg = Registry(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        reg.observe("latency_seconds", value, stage="ocr")
+
+    lines = reg.render().splitlines()
+    assert lines[1:] == [
+        'latency_seconds_bucket{stage="ocr",le="0.1"} 1',
+        'latency_seconds_bucket{stage="ocr",le="1"} 3',
+        'latency_seconds_bucket{stage="ocr",le="+Inf"} 4',
+        'latency_seconds_sum{stage="ocr"} 6.05',
+        'latency_seconds_count{stage="ocr"} 4',
+    ]
+    assert lines[0] == "# TYPE latency_seconds histogram"
+
+
+def test_render_escapes_label_values():
+    reg = Registry()
+    reg.inc("errors_total", type='Bad "quote"\\path\nnext')
+    assert 'errors_total{type="Bad \\"quote\\"\\\\path\\nnext"} 1' in reg.render()
+
+
+def test_total_sums_matching_label_sets():
+    reg = Registry()
+    reg.inc("calls_total", 2, model="a", endpoint="/x")
+    reg.inc("calls_total", 3, model="b", endpoint="/x")
+    reg.inc("calls_total", 5, model="a", endpoint="/y")
+    assert reg.total("calls_total") == 10
+    assert reg.total("calls_total", model="a") == 7
+    assert reg.get("calls_total", model="a", endpoint="/x") == 2
+
+
+def sum_line(name, endpoint, service):
+    """Value of a histogram's _sum line in the shared registry, or None."""
+    prefix = f'{name}_sum{{endpoint="{endpoint}",service="{service}"}} '
+    for line in registry.render().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return None
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    metrics.init_app(app, service="metrics-test")
+
+    @app.route('/nested')
+    def nested():
+        with metrics.stage("outer"):
+            for _ in range(2):
+                with metrics.stage("inner"):
+                    time.sleep(0.01)
+        return jsonify(g.metrics_stages)
+
+    @app.route('/threads')
+    def threads():
+        def work(i):
+            with metrics.stage("worker"):
+                time.sleep(0.01)
+            metrics.record_llm_usage("test-model", None)
+            return i
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(metrics.propagate(work), i) for i in range(4)]
+        assert [f.result() for f in futures] == list(range(4))
+        return jsonify({"stages": g.metrics_stages, "llm_calls": len(g.metrics_llm)})
+
+    @app.route('/stream')
+    def stream():
+        def generate():
+            yield "first\n"
+            time.sleep(0.2)
+            yield "second\n"
+        return Response(generate(), mimetype="text/plain")
+
+    return app.test_client()
+
+
+def test_nested_stages_add_up(client):
+    stages = client.get('/nested').json
+    assert stages["inner"] >= 0.02
+    assert stages["outer"] >= stages["inner"]
+
+
+def test_propagate_records_worker_stages_into_the_request(client):
+    data = client.get('/threads').json
+    assert data["stages"]["worker"] >= 4 * 0.01
+    assert data["llm_calls"] == 4
+    assert registry.total("llm_requests_total", service="metrics-test", endpoint="/threads") >= 4
+
+
+def test_streamed_response_is_timed_when_the_stream_closes(client):
+    before = registry.total("http_requests_total", service="metrics-test", endpoint="/stream")
+    response = client.get('/stream', buffered=False)
+    assert registry.total("http_requests_total", service="metrics-test", endpoint="/stream") == before
+
+    assert response.get_data(as_text=True) == "first\nsecond\n"
+    response.close()
+    assert registry.total("http_requests_total", service="metrics-test", endpoint="/stream") == before + 1
+    assert sum_line("http_request_duration_seconds", "/stream", "metrics-test") >= 0.2
+
+
+def test_metrics_endpoint_is_not_counted(client):
+    client.get('/metrics')
+    assert registry.total("http_requests_total", endpoint="/metrics") == 0
+    assert registry.get("http_requests_in_flight", service="metrics-test") == 0
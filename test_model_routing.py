@@ -0,0 +1,103 @@
+import pytest
+
+import model_routing
+import token_budget
+from metrics import registry
+
+
+@pytest.fixture(autouse=True)
+def default_policies():
+    model_routing.set_policies({})
+    yield
+    model_routing.set_policies({})
+
+
+def grade(score, confidence=0.9):
+    return {"score": score, "corrected_answer": "ideal", "confidence": confidence}
+
+
+def grading_attempt(small_results, large_result=None):
+    """Attempt function returning small_results in order, then large_result."""
+    calls = []
+    small_results = list(small_results)
+
+    def attempt(model, sample, small):
+        calls.append((model, sample, small))
+        result = small_results.pop(0) if small else large_result
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return attempt, calls
+
+
+def route_grade(small_results, large_result=grade(75)):
+    attempt, calls = grading_attempt(small_results, large_result)
+    result, info = model_routing.route("grade", attempt, model_routing.check_grade, model_routing.grades_agree)
+    return result, info, calls
+
+
+def test_confident_small_result_is_kept():
+    result, info, calls = route_grade([grade(85)])
+    assert result["score"] == 85
+    assert info == {"model": model_routing.SMALL_MODEL, "escalated": False, "reason": None}
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("small_result, reason", [
+    (grade(50), "borderline"),
+    (grade(85, confidence=0.4), "low_confidence"),
+    ({"score": 85, "corrected_answer": "ideal"}, "no_confidence"),
+    (grade(130), "invalid_score"),
+    (ValueError("bad JSON"), "invalid_output"),
+    (RuntimeError("rate limited"), "small_model_error"),
+])
+def test_uncertain_small_results_escalate(small_result, reason):
+    result, info, calls = route_grade([small_result])
+    assert result["score"] == 75
+    assert info == {"model": model_routing.LARGE_MODEL, "escalated": True, "reason": reason}
+    assert calls[-1] == (model_routing.LARGE_MODEL, 0, False)
+
+
+def test_request_too_large_is_not_escalated():
+    with pytest.raises(token_budget.RequestTooLarge):
+        route_grade([token_budget.RequestTooLarge("too big")])
+
+
+def test_second_sample_disagreement_escalates():
+    model_routing.set_policies({"grade": {"second_sample": True}})
+    _, info, calls = route_grade([grade(85), grade(65)])
+    assert info["reason"] == "samples_disagree"
+    assert [c[1] for c in calls] == [0, 1, 0]
+
+    _, info, _ = route_grade([grade(85), grade(90)])
+    assert info["escalated"] is False
+
+
+def test_large_strategy_skips_the_small_model():
+    model_routing.set_policies({"grade": {"strategy": "large"}})
+    _, info, calls = route_grade([])
+    assert calls == [(model_routing.LARGE_MODEL, 0, False)]
+    assert info["escalated"] is False
+
+
+def test_unknown_strategy_is_rejected():
+    model_routing.set_policies({"grade": {"strategy": "medium"}})
+    with pytest.raises(ValueError):
+        model_routing.get_policy("grade")
+
+
+def test_routes_are_counted():
+    before = registry.total("llm_route_total", route="grade", escalated="true", reason="borderline")
+    route_grade([grade(55)])
+    assert registry.total("llm_route_total", route="grade", escalated="true", reason="borderline") == before + 1
+
+
+@pytest.mark.parametrize("output, reason", [
+    ("A corrected answer.", None),
+    ("", "empty_output"),
+    ("x" * 1000, "length_ratio"),
+])
+def test_check_text(output, reason):
+    policy = model_routing.get_policy("correct")
+    assert model_routing.check_text(output, "A corected answer.", policy) == reason
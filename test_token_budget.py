@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+import token_budget
+from token_budget import check_request, count_tokens, max_input_tokens, output_budget, split_text
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    assert count_tokens("hello") >= 1
+    assert count_tokens("hello world " * 50) > count_tokens("hello world")
+
+
+def test_output_budget_is_clamped():
+    assert output_budget(0, 2.0, 384, 1024, 2048) == 1024
+    assert output_budget(400, 2.0, 384, 1024, 2048) == 1184
+    assert output_budget(10 ** 6, 2.0, 384, 1024, 2048) == 2048
+
+
+def test_check_request():
+    check_request(token_budget.MAX_REQUEST_TOKENS - 100, 100)
+    with pytest.raises(token_budget.RequestTooLarge):
+        check_request(token_budget.MAX_REQUEST_TOKENS - 100, 101)
+
+
+def test_max_input_tokens_fits_a_single_request():
+    overhead, ratio, base = 200, 1.3, 64
+    limit = max_input_tokens(overhead, ratio, base)
+    max_tokens = output_budget(limit, ratio, base, 128)
+    check_request(overhead + limit, max_tokens)
+
+
+def test_split_text_keeps_lines_together_under_the_limit():
+    lines = [f"line {i} with a few words of text" for i in range(200)]
+    text = "\n".join(lines)
+    chunks = split_text(text, 100)
+    assert len(chunks) > 1
+    assert "\n".join(chunks) == text
+    assert all(count_tokens(chunk) <= 100 for chunk in chunks)
+
+
+def test_split_text_short_text_is_one_chunk():
+    assert split_text("a short answer", 100) == ["a short answer"]
+
+
+def test_split_text_splits_overlong_lines_between_words():
+    line = " ".join(f"word{i}" for i in range(2000))
+    chunks = split_text(line, 200)
+    assert " ".join(chunks) == line
+    assert all(count_tokens(chunk) <= 200 for chunk in chunks)
+
+
+def test_split_text_overlong_line_is_linear():
+    line = " ".join(f"w{i % 97}x" for i in range(20000))
+    start = time.perf_counter()
+    split_text(line, 2000)
+    assert time.perf_counter() - start < 2
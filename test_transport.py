@@ -0,0 +1,60 @@
+import gzip
+
+import pytest
+from flask import Flask, jsonify
+
+import transport
+
+
+def test_frames_round_trip():
+    payloads = [b"first", b"", b"\x00" * 1000]
+    frames = transport.unpack_frames(transport.pack_frames(payloads))
+    assert [bytes(frame) for frame in frames] == payloads
+
+
+def test_unpack_empty_body():
+    assert transport.unpack_frames(b"") == []
+
+
+@pytest.mark.parametrize("body", [b"\x00\x00", b"\x00\x00\x00\x05abc"])
+def test_unpack_truncated_body(body):
+    with pytest.raises(ValueError):
+        transport.unpack_frames(body)
+
+
+@pytest.mark.parametrize("mimetype, expected", [
+    ("application/octet-stream", True),
+    ("image/png", True),
+    ("image/gif", True),
+    ("application/json", False),
+    ("multipart/form-data", False),
+])
+def test_is_binary_image(mimetype, expected):
+    assert transport.is_binary_image(mimetype) is expected
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    transport.init_app(app)
+
+    @app.route('/big')
+    def big():
+        return jsonify({"text": ["line of text"] * 500})
+
+    @app.route('/small')
+    def small():
+        return jsonify({"ok": True})
+
+    return app.test_client()
+
+
+def test_large_responses_are_gzipped(client):
+    response = client.get('/big', headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert b"line of text" in gzip.decompress(response.data)
+
+
+def test_small_or_unrequested_responses_are_not_gzipped(client):
+    assert "Content-Encoding" not in client.get('/small', headers={"Accept-Encoding": "gzip"}).headers
+    assert "Content-Encoding" not in client.get('/big').headers
@@ -0,0 +1,150 @@
+"""
+Local prompt-token estimation and output sizing for LLM calls.
+
+Counts tokens with tiktoken's cl100k_base encoding when tiktoken is
+installed; otherwise falls back to a regex pre-tokenizer heuristic. Either
+way this only approximates the Llama 3 vocabulary the Groq models use:
+the difference from the API-reported prompt tokens is exported as
+llm_prompt_tokens_estimate_abs_error_total (see metrics.py), so limits
+close to the real ones should leave some margin. Used to size max_tokens
+from the expected output, and to reject or split inputs that would not fit
+the model's context window / per-request token limit before calling the API.
+
+Configuration (environment variables):
+    LLM_CONTEXT_WINDOW         model context window (default 131072)
+    LLM_MAX_COMPLETION_TOKENS  model output limit (default 32768)
+    LLM_MAX_REQUEST_TOKENS     optional cap on prompt + max_tokens per call,
+                               e.g. the account's tokens-per-minute limit
+"""
+import math
+import os
+import re
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+CONTEXT_WINDOW = int(os.environ.get("LLM_CONTEXT_WINDOW", 131072))
+MAX_COMPLETION_TOKENS = int(os.environ.get("LLM_MAX_COMPLETION_TOKENS", 32768))
+MAX_REQUEST_TOKENS = int(os.environ.get("LLM_MAX_REQUEST_TOKENS", 0)) or CONTEXT_WINDOW
+
+# Chat template tokens added around each message and before the reply
+TOKENS_PER_MESSAGE = 5
+TOKENS_PER_REPLY = 5
+
+# Pieces similar to the BPE pre-tokenizer: contractions, words with their
+# leading space, digit groups, punctuation/other runs, whitespace
+_PIECE_RE = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[A-Za-z]+| ?\d{1,3}| ?[^\sA-Za-z\d]+|\s+")
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding, tiktoken
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # Encoding files unavailable (e.g. no network); use the heuristic
+            tiktoken = None
+    return _encoding
+
+
+def _estimate_piece(piece):
+    stripped = piece.strip()
+    if not stripped:
+        return 1
+    if stripped.isascii() and stripped.isalpha():
+        # Common words are one token; long/rare words split into ~5-char pieces
+        return 1 if len(stripped) <= 7 else math.ceil(len(stripped) / 5)
+    if stripped.isascii():
+        return math.ceil(len(stripped) / 2) if len(stripped) > 2 else 1
+    # Non-ASCII text is mostly split by UTF-8 bytes
+    return math.ceil(len(stripped.encode("utf-8")) / 3)
+
+
+def count_tokens(text):
+    """Estimate the number of tokens in a string."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(_estimate_piece(piece) for piece in _PIECE_RE.findall(text))
+
+
+def count_message_tokens(messages):
+    """Estimate the prompt tokens of a chat completion request."""
+    return sum(count_tokens(m.get("content", "")) + TOKENS_PER_MESSAGE for m in messages) + TOKENS_PER_REPLY
+
+
+def output_budget(input_tokens, ratio, base, minimum, maximum=MAX_COMPLETION_TOKENS):
+    """
+    Size max_tokens for an expected output of about `base + ratio * input_tokens`,
+    clamped to [minimum, maximum] and to the model's output limit.
+    """
+    budget = int(math.ceil(base + ratio * input_tokens))
+    return max(minimum, min(budget, maximum, MAX_COMPLETION_TOKENS))
+
+
+def max_input_tokens(overhead_tokens, ratio, base):
+    """
+    Largest input (in tokens) whose prompt plus sized output still fits a
+    single request, for an output budget of `base + ratio * input_tokens`.
+    """
+    by_request = (MAX_REQUEST_TOKENS - overhead_tokens - base) / (1 + ratio)
+    by_output = (MAX_COMPLETION_TOKENS - base) / ratio if ratio else by_request
+    return max(1, int(min(by_request, by_output)))
+
+
+class RequestTooLarge(ValueError):
+    """Raised when a request cannot fit the model's token limits."""
+
+
+def check_request(prompt_tokens, max_tokens):
+    """Raise RequestTooLarge if prompt plus reserved output exceeds the limit."""
+    limit = MAX_REQUEST_TOKENS
+    if prompt_tokens + max_tokens > limit:
+        raise RequestTooLarge(
+            f"Request needs about {prompt_tokens} prompt + {max_tokens} output tokens, "
+            f"exceeding the {limit} token limit"
+        )
+
+
+def split_text(text, max_tokens):
+    """
+    Split text into chunks of at most `max_tokens` tokens, on line boundaries
+    where possible (overlong lines are split between words).
+    """
+    chunks, current, current_tokens = [], [], 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n".join(current))
+        current, current_tokens = [], 0
+
+    for line in text.split("\n"):
+        line_tokens = count_tokens(line) + 1
+        if line_tokens > max_tokens:
+            flush()
+            # Keep a running count: re-counting the joined piece per word is quadratic
+            piece, piece_tokens = [], 0
+            for word in line.split(" "):
+                word_tokens = count_tokens(" " + word if piece else word)
+                if piece and piece_tokens + word_tokens > max_tokens:
+                    chunks.append(" ".join(piece))
+                    piece, piece_tokens = [], 0
+                    word_tokens = count_tokens(word)
+                piece.append(word)
+                piece_tokens += word_tokens
+            if piece:
+                chunks.append(" ".join(piece))
+            continue
+        if current_tokens + line_tokens > max_tokens:
+            flush()
+        current.append(line)
+        current_tokens += line_tokens
+    flush()
+    return chunks
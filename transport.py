@@ -0,0 +1,104 @@
+"""
+Request/response transport helpers shared by the Flask services.
+
+- A length-prefixed framed format for sending several images in one body:
+  each frame is a 4-byte big-endian length followed by that many bytes
+- A faster JSON provider (orjson, when installed) for parsing and encoding
+- Optional gzip compression of large responses (RESPONSE_GZIP=0 disables,
+  RESPONSE_GZIP_MIN_SIZE sets the threshold in bytes)
+"""
+import gzip
+import os
+import struct
+
+from flask import request
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+FRAMES_MIMETYPE = "application/x-ocr-frames"
+
+_FRAME_HEADER = struct.Struct(">I")
+
+GZIP_ENABLED = os.environ.get("RESPONSE_GZIP", "1").lower() not in ("0", "false", "no")
+GZIP_MIN_SIZE = int(os.environ.get("RESPONSE_GZIP_MIN_SIZE", 1400))
+GZIP_LEVEL = 5
+
+
+# ---------- FRAMED BATCHES ----------
+def pack_frames(payloads):
+    """Encode a list of byte strings as length-prefixed frames."""
+    parts = []
+    for payload in payloads:
+        parts.append(_FRAME_HEADER.pack(len(payload)))
+        parts.append(payload)
+    return b"".join(parts)
+
+
+def unpack_frames(data):
+    """
+    Split a length-prefixed framed body into memoryviews of each payload
+    (no copies). Raises ValueError on a truncated body.
+    """
+    view = memoryview(data)
+    frames = []
+    offset = 0
+    while offset < len(view):
+        if offset + _FRAME_HEADER.size > len(view):
+            raise ValueError("Truncated frame header")
+        (length,) = _FRAME_HEADER.unpack_from(view, offset)
+        offset += _FRAME_HEADER.size
+        if offset + length > len(view):
+            raise ValueError("Truncated frame payload")
+        frames.append(view[offset:offset + length])
+        offset += length
+    return frames
+
+
+def is_binary_image(mimetype):
+    """True for raw image bodies: application/octet-stream or any image/* type."""
+    return mimetype == "application/octet-stream" or mimetype.startswith("image/")
+
+
+# ---------- JSON ----------
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson; output matches Flask's sorted-key default."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                            | orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+# ---------- APP SETUP ----------
+def init_app(app):
+    """Install the fast JSON provider (if available) and response gzip on an app."""
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
+
+    @app.after_request
+    def _gzip_response(response):
+        if (not GZIP_ENABLED
+                or response.direct_passthrough
+                or response.is_streamed
+                or response.status_code < 200
+                or response.status_code == 206
+                or "Content-Encoding" in response.headers
+                or "gzip" not in request.headers.get("Accept-Encoding", "").lower()):
+            return response
+
+        data = response.get_data()
+        if len(data) < GZIP_MIN_SIZE:
+            return response
+
+        response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+        return response
+
+    return app